@@ -10,7 +10,11 @@
 #
 # Description:
 # ------------------------------------
-#	undocumented
+#	The extracted documentation of each VHDL file is cached in the file
+#	.poc_extract.cache, keyed by the path of the VHDL file. A cached entry is
+#	reused as long as the size and modification time, or else the SHA-1 hash of
+#	the content, of the VHDL file are unchanged. reST files are only written
+#	if their content changed, so that Sphinx only rebuilds the changed pages.
 #
 # License:
 # ==============================================================================
@@ -29,10 +33,75 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-from enum           import Enum
-from pathlib        import Path
-from re             import compile as re_compile
-from textwrap       import dedent
+from argparse           import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib         import contextmanager
+from enum               import Enum
+from hashlib            import sha1
+from locale             import getpreferredencoding
+from mmap               import mmap, ACCESS_READ
+from os                 import cpu_count, fstat
+from pathlib            import Path
+from pickle             import dump as pickle_dump, load as pickle_load
+from re                 import compile as re_compile
+from textwrap           import dedent
+from time               import perf_counter
+
+# increment if the extracted information changes, to invalidate all cached entries
+EXTRACT_CACHE_VERSION = 2
+
+SECTIONS =      ('Authors', 'Entity', 'Description', 'SeeAlso', 'License')
+SECTION_STRIP = {
+	'Authors':     True,
+	'Entity':      True,
+	'Description': False,
+	'SeeAlso':     False,
+	'License':     False
+}
+
+# Classifies a line of a VHDL file by a single match, the name of the matching outer group is the kind of the line.
+# The pattern matches the undecoded bytes of a line including its line break, see ReadSourceLines.
+LINE_CLASSIFIER_RE = re_compile((
+	r"(?P<HeaderStart>--\s*={16,}\r?$)"
+	r"|(?P<SectionStart>--\s*(?P<Section>" + "|".join(SECTIONS) + r"):\s*(?P<Content>.*?)\r?$)"
+	r"|(?P<Underline>-- -+\r?$)"
+	r"|(?P<Comment>--)"
+	r"|(?P<EntityStart>(?i:entity)\s+(?P<EntityName>\w+)\s+(?i:is))"
+	r"|(?P<EntityEnd>(?i:end)\s+(?P<EndName>\w+)(?:\s+\w+)?\s*;)"
+	r"|(?P<OtherUnit>(?i:package|architecture|configuration)\s|(?i:context)\s+\w+\s+(?i:is)\b)"
+).encode("ascii"))
+
+# VHDL files up to this size are read through a buffered reader, larger ones are memory-mapped
+MMAP_THRESHOLD =  64 * 1024
+# encoding of the decoded slices, the same as for files opened in text mode
+SOURCE_ENCODING = getpreferredencoding(False)
+
+@contextmanager
+def ReadSourceLines(sourceFile):
+	"""
+	Yields an iterator over the undecoded lines of sourceFile. Files up to
+	MMAP_THRESHOLD bytes are read through a buffered reader, so that only a
+	prefix up to the last requested line is read. Larger files are
+	memory-mapped.
+	"""
+	with sourceFile.open('rb') as fileHandle:
+		if fstat(fileHandle.fileno()).st_size < MMAP_THRESHOLD:
+			yield fileHandle
+		else:
+			with mmap(fileHandle.fileno(), 0, access=ACCESS_READ) as content:
+				yield iter(content.readline, b"")
+
+def DecodeComment(line):
+	"""Returns the undecoded comment line without the comment marker '-- ?', with a universal newline like in text mode."""
+	text = line[3 if line.startswith(b'-- ') else 2:].decode(SOURCE_ENCODING)
+	return (text[:-2] + "\n") if text.endswith("\r\n") else text
+
+class ExtractState(Enum):
+	BeforeDocHeader  = 0
+	InDocHeader      = 1
+	BeforeEntityDecl = 2
+	InEntityDecl     = 3
+	Done             = 4
 
 def setup(app):
 	pass
@@ -56,6 +125,24 @@ class SourceFile:
 		self.SeeAlso =                ""  # seeAlso
 
 
+class ExtractCacheEntry:
+	def __init__(self, digest, result, error):
+		self.Size =             0
+		self.ModificationTime = 0
+		self.Digest =           digest    # SHA-1 of the VHDL file
+		self.Result =           result    # SourceFile or None
+		self.Error =            error     # error message if no documentation was extracted
+
+
+def ExtractEntry(sourceFile):
+	"""Parses one VHDL file and returns its ExtractCacheEntry. Runs in the worker processes of Extract.ExtractAll."""
+	digest = sha1(sourceFile.read_bytes()).hexdigest()
+	try:
+		return ExtractCacheEntry(digest, Extract().ExtractComments(sourceFile), None)
+	except Exception as ex:
+		return ExtractCacheEntry(digest, None, str(ex))
+
+
 class Extract:
 	def __init__(self):
 		self.sourceDirectory =       Path("../src")
@@ -66,8 +153,21 @@ class Extract:
 		self.templateFile =     Path("Entity.template")
 		self.templateContent =  ""
 
-	def Run(self):
+		self.cacheFile =        Path(".poc_extract.cache")
+		self.cache =            {}
+		self.newCache =         {}
+
+	def Run(self, jobs=1):
+		"""
+		Extracts the documentation of all VHDL files and writes the reST files.
+		If jobs is greater than 1, then the VHDL files are parsed by that many
+		worker processes. The output is the same in both cases.
+		"""
+		self.cache =    self.LoadCache()
+		self.newCache = {}
 		result = self.recursion(self.sourceDirectory)
+		self.ExtractAll(result, jobs)
+		self.SaveCache()
 
 		print("Reading template file...")
 		with self.templateFile.open('r') as templateFileHandle:
@@ -77,9 +177,10 @@ class Extract:
 		self.recursion2(result)
 
 	def recursion(self, sourceDirectory):
+		"""Returns the tree of all VHDL files to extract, sorted by name. Leafs are the paths of the VHDL files."""
 		result = {}
 
-		for item in sourceDirectory.iterdir():
+		for item in sorted(sourceDirectory.iterdir()):
 			if item.is_dir():
 				stem = item.stem
 				if ((stem not in ["Altera", "altera", "Lattice", "lattice", "Xilinx", "xilinx"]) and not stem.startswith(("cvs_", "old_"))):
@@ -88,13 +189,81 @@ class Extract:
 			elif item.is_file():
 				if (item.suffix == ".vhdl"):
 					if (not item.stem.endswith(("Altera", "altera", "Lattice", "lattice", "Xilinx", "xilinx")) and not item.stem.startswith(("cvs_", "old_"))):
-						try:
-							result[item.stem] = self.ExtractComments(item)
-						except Exception as ex:
-							print("    " + str(ex))
+						result[item.stem] = item
 
 		return result
 
+	def ExtractAll(self, result, jobs=1):
+		"""
+		Replaces the paths in the tree result by the extracted SourceFile
+		objects, VHDL files without documentation are removed. Files which
+		changed since the previous run are parsed in parallel if jobs is greater
+		than 1. The results are merged in the order of the tree.
+		"""
+		leafs = []
+		def collect(tree):
+			for key, item in tree.items():
+				if isinstance(item, dict):
+					collect(item)
+				else:
+					leafs.append((tree, key, item))
+		collect(result)
+
+		entries = [self.LookupCache(sourceFile) for _, _, sourceFile in leafs]
+		pending = [sourceFile for (_, _, sourceFile), entry in zip(leafs, entries) if entry is None]
+		if (jobs > 1) and (len(pending) > 1):
+			with ProcessPoolExecutor(max_workers=jobs) as executor:
+				parsed = executor.map(ExtractEntry, pending, chunksize=max(1, len(pending) // (4 * jobs)))
+				parsed = list(parsed)
+		else:
+			parsed = [ExtractEntry(sourceFile) for sourceFile in pending]
+
+		parsed = iter(parsed)
+		for (tree, key, sourceFile), entry in zip(leafs, entries):
+			if entry is None:
+				print("  Reading '{0!s}'...".format(sourceFile))
+				entry = next(parsed)
+			elif entry.Error is not None:
+				# name the cached file before repeating its error
+				print("  Cached '{0!s}'...".format(sourceFile))
+			self.UpdateCache(sourceFile, entry)
+			if entry.Error is not None:
+				print("    " + entry.Error)
+				del tree[key]
+			else:
+				tree[key] = entry.Result
+
+	def LoadCache(self):
+		"""Returns the cached entries of the previous run, or an empty cache if the cache file is missing or outdated."""
+		try:
+			with self.cacheFile.open('rb') as cacheFileHandle:
+				version, entries = pickle_load(cacheFileHandle)
+		except Exception:
+			return {}
+
+		return entries if (version == EXTRACT_CACHE_VERSION) else {}
+
+	def SaveCache(self):
+		"""Writes the entries of all VHDL files visited in this run."""
+		with self.cacheFile.open('wb') as cacheFileHandle:
+			pickle_dump((EXTRACT_CACHE_VERSION, self.newCache), cacheFileHandle)
+
+	def LookupCache(self, sourceFile):
+		"""Returns the cached entry of sourceFile, or None if the VHDL file changed since the previous run."""
+		entry = self.cache.get(sourceFile.as_posix())
+		if entry is not None:
+			status = sourceFile.stat()
+			if (entry.Size != status.st_size) or (entry.ModificationTime != status.st_mtime_ns):
+				if entry.Digest != sha1(sourceFile.read_bytes()).hexdigest():
+					return None
+		return entry
+
+	def UpdateCache(self, sourceFile, entry):
+		status =                 sourceFile.stat()
+		entry.Size =             status.st_size
+		entry.ModificationTime = status.st_mtime_ns
+		self.newCache[sourceFile.as_posix()] = entry
+
 	def recursion2(self, result):
 		for item in result.values():
 			if isinstance(item, dict):
@@ -109,7 +278,6 @@ class Extract:
 
 		testbenchRelPath = Path(sourceRelPath.with_name(sourceRelPath.stem + "_tb.vhdl"))
 
-		print("Writing reST file '{0!s}'.".format(outputFile))
 
 		# print("  Authors: {0}".format(", ".join(sourceFile.Authors)))
 		# print("  Summary: {0}".format(sourceFile.Summary))
@@ -135,9 +303,35 @@ class Extract:
 			SeeAlsoBox=seeAlsoBox
 		)
 
+		# keep the modification time of unchanged files for the incremental build of Sphinx
+		if outputFile.is_file():
+			with outputFile.open('r') as restructuredTextHandle:
+				if restructuredTextHandle.read() == outputContent:
+					return
+
+		print("Writing reST file '{0!s}'.".format(outputFile))
+		outputFile.parent.mkdir(parents=True, exist_ok=True)
 		with outputFile.open('w') as restructuredTextHandle:
 			restructuredTextHandle.write(outputContent)
 
+	def Benchmark(self, rounds=5):
+		"""Prints the throughput of ExtractComments for all VHDL files of the source directory, best of rounds."""
+		files = sorted(self.sourceDirectory.rglob("*.vhdl"))
+		lines = sum(len(sourceFile.read_bytes().splitlines()) for sourceFile in files)
+
+		best = None
+		for _ in range(rounds):
+			start = perf_counter()
+			for sourceFile in files:
+				try:
+					self.ExtractComments(sourceFile)
+				except Exception:
+					pass
+			elapsed = perf_counter() - start
+			best = elapsed if (best is None) else min(best, elapsed)
+
+		print("{0} files, {1} lines in {2:.3f} s: {3:,.0f} lines/s".format(len(files), lines, best, lines / best))
+
 	def ExtractComments(self, sourceFile):
 		"""
 		Extracts the documentation from the header of a PoC VHDL source.
@@ -149,85 +343,65 @@ class Extract:
 		  <Section> as one of Authors|Entity|Description|SeeAlso|License.
 		* An underline /^-- -+$/ immediately following a section opening is ignored.
 		* After the documentation header, the entity name is extracted from the entity declaration.
+
+		Each line is classified by a single match of LINE_CLASSIFIER_RE. Reading
+		stops at the end of the entity declaration, or at the first package,
+		architecture, configuration or context declaration (not a context
+		reference) if no entity was declared before.
+		The file is scanned as bytes, see ReadSourceLines, and only the comments
+		of the documentation header and the entity name are decoded.
 		"""
-		class State(Enum):
-			BeforeDocHeader  = 0
-			InDocHeader      = 1
-			BeforeEntityDecl = 2
-			InEntityDecl     = 3
-			Done             = 4
-
-		sectionStrip = {
-			'Authors':     True,
-			'Entity':      True,
-			'Description': False,
-			'SeeAlso':     False,
-			'License':     False
-		}
-		sections = {
-			'Authors':     '',
-			'Entity':      '',
-			'Description': '',
-			'SeeAlso':     '',
-			'License':     ''
-		}
-
-		headerStartRE  = re_compile(r'^--\s*={16,}$')
-		sectionStartRE = re_compile(r'^--\s*(?P<Section>'+('|'.join(sections.keys()))+r'):\s*(?P<Content>.*)$')
-		underlineRE    = re_compile(r'^-- -+$')
-		commentStripRE = re_compile(r'^-- ?')
-
-		entityStartRE = re_compile(r"(?i)entity\s+(?P<EntityName>\w+)\s+is")
-		entityEndRE   = re_compile(r"(?i)end\s+(?P<EntityName>\w+)(\s+\w+)?\s*;")
+		sections = dict.fromkeys(SECTIONS, '')
 
 		entityName =          ""
 		entityStartLine =     0
 		entityEndLine =       0
 
 		# Parse the Source File
-		print("  Reading '{0!s}'...".format(sourceFile))
-		state = State.BeforeDocHeader
-		with sourceFile.open('r') as vhdlFileHandle:
+		state = ExtractState.BeforeDocHeader
+		with ReadSourceLines(sourceFile) as lines:
 			lineNumber = 0
-			for line in vhdlFileHandle:
+			for line in lines:
 				lineNumber += 1
+				m =    LINE_CLASSIFIER_RE.match(line)
+				kind = m.lastgroup if m else None
 
 				# Parse Documentation Header into Sections
-				if state is State.BeforeDocHeader:
-					if headerStartRE.match(line):
+				if state is ExtractState.BeforeDocHeader:
+					if kind == 'HeaderStart':
 						section = None
-						state   = State.InDocHeader
-
-				elif state is State.InDocHeader:
-					if not line.startswith('--'):
-						state = State.BeforeEntityDecl
+						state   = ExtractState.InDocHeader
+						continue
+
+				elif state is ExtractState.InDocHeader:
+					if kind == 'SectionStart':
+						section = m.group('Section').decode("ascii")
+						sections[section] += m.group('Content').decode(SOURCE_ENCODING)
+					elif kind in ('HeaderStart', 'Underline', 'Comment'):
+						if sections[section] != '' or kind != 'Underline':
+							line = DecodeComment(line)
+							sections[section] += line.lstrip() if SECTION_STRIP[section] else line
 					else:
-						m = sectionStartRE.match(line)
-						if m:
-							section = m.group('Section')
-							sections[section] += m.group('Content')
-						elif sections[section] != '' or not underlineRE.match(line):
-							line = commentStripRE.sub('', line)
-							sections[section] += line.lstrip() if sectionStrip[section] else line
+						state = ExtractState.BeforeEntityDecl
 
 				# Parse Entity Declaration
-				if state is State.BeforeDocHeader or state is State.BeforeEntityDecl:
-					m = entityStartRE.match(line)
-					if m:
-						entityName      = m.group("EntityName")
+				if state is ExtractState.BeforeDocHeader or state is ExtractState.BeforeEntityDecl:
+					if kind == 'EntityStart':
+						entityName      = m.group("EntityName").decode("ascii")
 						entityStartLine = lineNumber
-						state           = State.InEntityDecl
+						state           = ExtractState.InEntityDecl
+					elif kind == 'OtherUnit':
+						break
 
-				elif state is State.InEntityDecl:
-					m = entityEndRE.match(line)
-					if m:
-						name = m.group('EntityName')
+				elif state is ExtractState.InEntityDecl:
+					if kind == 'EntityEnd':
+						name = m.group('EndName').decode("ascii")
 						if name == 'entity' or name == entityName:
 							entityEndLine = lineNumber
-							state         = State.Done
+							state         = ExtractState.Done
 							break
 
-		if state is not State.Done:
+		if state is not ExtractState.Done:
 			raise Exception("No entity found. LastState = {0}".format(state.name))
 
 		# Construct Result Object
@@ -243,5 +417,13 @@ class Extract:
 		return result
 
 if (__name__ == "__main__"):
+	argParser = ArgumentParser(description="Extract embedded ReST documentation from VHDL primary units.")
+	argParser.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes parsing the VHDL files, 0 = number of CPUs.")
+	argParser.add_argument("--benchmark", action="store_true", help="Print the parsing throughput instead of writing reST files.")
+	args = argParser.parse_args()
+
 	e = Extract()
-	e.Run()
+	if args.benchmark:
+		e.Benchmark()
+	else:
+		e.Run(args.jobs or cpu_count() or 1)
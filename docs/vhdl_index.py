@@ -0,0 +1,267 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+#	Authors:          Patrick Lehmann
+#
+#	Python Script:    Persistent index of all VHDL design units in src/ and tb/
+#
+# Description:
+# ------------------------------------
+#	Records the entities, architectures, packages, package bodies,
+#	configurations, contexts and component declarations, as well as the
+#	library, use and context clauses, of every VHDL file in a SQLite database.
+#
+#	The index is updated incrementally: a file is only parsed again if its
+#	size and modification time, and then its SHA-1 hash, changed. Entries of
+#	deleted files are removed.
+#
+#	Tables:
+#	* files (id, path, size, mtime_ns, digest), path relative to the root directory
+#	* units (file, kind, name, parent, start_line, end_line), parent is the
+#	  entity of an architecture or configuration, or the enclosing unit of a
+#	  component declaration
+#	* clauses (file, kind, name, line), kind is one of library, use, context
+#
+#	Usage from the docs directory:
+#	  python vhdl_index.py [--kind entity] [name]
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+from argparse           import ArgumentParser
+from collections        import namedtuple
+from hashlib            import sha1
+from pathlib            import Path
+from re                 import compile as re_compile, IGNORECASE
+from sqlite3            import connect as sqlite_connect
+
+# increment if the schema or the parser changes, to rebuild the whole index
+INDEX_VERSION = 1
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+	id       INTEGER PRIMARY KEY,
+	path     TEXT    NOT NULL UNIQUE,
+	size     INTEGER NOT NULL,
+	mtime_ns INTEGER NOT NULL,
+	digest   TEXT    NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+	file       INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+	kind       TEXT    NOT NULL,
+	name       TEXT    NOT NULL COLLATE NOCASE,
+	parent     TEXT             COLLATE NOCASE,
+	start_line INTEGER NOT NULL,
+	end_line   INTEGER
+);
+CREATE TABLE IF NOT EXISTS clauses (
+	file INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+	kind TEXT    NOT NULL,
+	name TEXT    NOT NULL COLLATE NOCASE,
+	line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS units_name   ON units (name);
+CREATE INDEX IF NOT EXISTS units_file   ON units (file);
+CREATE INDEX IF NOT EXISTS clauses_file ON clauses (file);
+"""
+
+DesignUnit = namedtuple("DesignUnit", ["Path", "Kind", "Name", "Parent", "StartLine", "EndLine"])
+Clause =     namedtuple("Clause",     ["Path", "Kind", "Name", "Line"])
+
+# unit declarations, the first group is the kind, then the name and the optional parent entity
+UNIT_START_RES = [(kind, re_compile(pattern, IGNORECASE)) for kind, pattern in (
+	("entity",        r"^\s*entity\s+(\w+)\s*(?:is\b|$)"),
+	("architecture",  r"^\s*architecture\s+(\w+)\s+of\s+(\w+)"),
+	("package body",  r"^\s*package\s+body\s+(\w+)"),
+	("package",       r"^\s*package\s+(\w+)\s*(?:is\b|$)"),
+	("configuration", r"^\s*configuration\s+(\w+)\s+of\s+(\w+)"),
+	("context",       r"^\s*context\s+(\w+)\s+is\b"),
+	("component",     r"^\s*component\s+(\w+)")
+)]
+UNIT_END_RE =    re_compile(r"^\s*end\s+(\w+)(?:\s+body)?(?:\s+(\w+))?\s*;", IGNORECASE)
+INSTANCE_RE =    re_compile(r"\bis\s+new\b", IGNORECASE)
+CLAUSE_RE =      re_compile(r"^\s*(library|use|context)\s+([\w.]+(?:\s*,\s*[\w.]+)*)\s*;", IGNORECASE)
+UNIT_KEYWORDS =  {"entity", "architecture", "package", "configuration", "context", "component"}
+
+def ParseDesignUnits(content):
+	"""
+	Returns the tuple (units, clauses) of the VHDL source code content (str).
+	units is a list of tuples (kind, name, parent, startLine, endLine), clauses
+	a list of tuples (kind, name, line). endLine is None if the end of a unit
+	was not found.
+	"""
+	units =   []
+	clauses = []
+	open_ =   []     # indexes into units of all units not yet ended, innermost last
+	instance = None  # index into units of a package instantiation, which ends at the next semicolon
+	for lineNumber, line in enumerate(content.splitlines(), 1):
+		line = line.split("--", 1)[0]
+		if line.strip() == "":
+			continue
+		if (instance is not None) and (";" in line):
+			units[instance][4] = lineNumber
+			instance = None
+
+		m = CLAUSE_RE.match(line)
+		if m:
+			kind = m.group(1).lower()
+			for name in m.group(2).split(","):
+				clauses.append((kind, name.strip(), lineNumber))
+			continue
+
+		m = UNIT_END_RE.match(line)
+		if m:
+			word, name = m.group(1).lower(), (m.group(2) or "").lower()
+			# close the innermost unit matching the kind keyword or the name, e.g., 'end entity;' or 'end rtl;'
+			for position in range(len(open_) - 1, -1, -1):
+				kind, unitName = units[open_[position]][0], units[open_[position]][1].lower()
+				if (word == unitName) or ((word in UNIT_KEYWORDS) and kind.startswith(word) and (name in ("", unitName))):
+					for index in open_[position:]:
+						units[index][4] = lineNumber
+					del open_[position:]
+					break
+			continue
+
+		for kind, pattern in UNIT_START_RES:
+			m = pattern.match(line)
+			if m:
+				if kind == "component":
+					parent = units[open_[-1]][1] if open_ else None
+				else:
+					parent = m.group(2) if (m.lastindex or 0) >= 2 else None
+				if (kind == "package") and INSTANCE_RE.search(line):
+					instance = len(units)
+					if ";" in line:
+						instance, endLine = None, lineNumber
+					else:
+						endLine = None
+				else:
+					open_.append(len(units))
+					endLine = None
+				units.append([kind, m.group(1), parent, lineNumber, endLine])
+				break
+
+	return [tuple(unit) for unit in units], clauses
+
+
+class DesignUnitIndex:
+	def __init__(self, databaseFile, rootDirectory):
+		self.rootDirectory = Path(rootDirectory)
+		self.connection =    sqlite_connect(str(databaseFile))
+		self.connection.execute("PRAGMA foreign_keys = ON")
+
+		version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+		if version != INDEX_VERSION:
+			with self.connection:
+				for table in ("clauses", "units", "files"):
+					self.connection.execute("DROP TABLE IF EXISTS {0}".format(table))
+				self.connection.execute("PRAGMA user_version = {0}".format(INDEX_VERSION))
+		self.connection.executescript(INDEX_SCHEMA)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.Close()
+
+	def Close(self):
+		self.connection.close()
+
+	def Update(self, directories=("src", "tb")):
+		"""
+		Indexes all VHDL files (*.vhdl, *.vhd) below the given directories of the
+		root directory. Returns the tuple (parsed, removed) of the numbers of
+		files parsed again and of files removed from the index.
+		"""
+		indexed = {path: (fileID, size, mtime, digest) for fileID, path, size, mtime, digest
+							 in self.connection.execute("SELECT id, path, size, mtime_ns, digest FROM files")}
+		parsed =  0
+		with self.connection:
+			for directory in directories:
+				for sourceFile in sorted((self.rootDirectory / directory).rglob("*.vhd*")):
+					if sourceFile.suffix not in (".vhdl", ".vhd") or not sourceFile.is_file():
+						continue
+
+					path =   sourceFile.relative_to(self.rootDirectory).as_posix()
+					status = sourceFile.stat()
+					entry =  indexed.pop(path, None)
+					if (entry is not None) and (entry[1] == status.st_size) and (entry[2] == status.st_mtime_ns):
+						continue
+
+					content = sourceFile.read_bytes()
+					digest =  sha1(content).hexdigest()
+					if (entry is not None) and (entry[3] == digest):
+						self.connection.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?", (status.st_size, status.st_mtime_ns, entry[0]))
+						continue
+
+					if entry is not None:
+						self.connection.execute("DELETE FROM files WHERE id = ?", (entry[0],))
+					self._insert(path, status, digest, content.decode("latin-1"))
+					parsed += 1
+
+			# files which no longer exist
+			for fileID, _, _, _ in indexed.values():
+				self.connection.execute("DELETE FROM files WHERE id = ?", (fileID,))
+
+		return parsed, len(indexed)
+
+	def _insert(self, path, status, digest, content):
+		units, clauses = ParseDesignUnits(content)
+		fileID = self.connection.execute("INSERT INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+																		 (path, status.st_size, status.st_mtime_ns, digest)).lastrowid
+		self.connection.executemany("INSERT INTO units VALUES (?, ?, ?, ?, ?, ?)", [(fileID,) + unit for unit in units])
+		self.connection.executemany("INSERT INTO clauses VALUES (?, ?, ?, ?)",     [(fileID,) + clause for clause in clauses])
+
+	def Units(self, kind=None, name=None, path=None):
+		"""Returns the list of DesignUnit tuples matching all given filters, names are compared case-insensitive."""
+		query, parameters = self._filter("SELECT path, kind, name, parent, start_line, end_line FROM units JOIN files ON units.file = files.id",
+																		 kind, name, path)
+		return [DesignUnit(*row) for row in self.connection.execute(query + " ORDER BY path, start_line", parameters)]
+
+	def Clauses(self, kind=None, name=None, path=None):
+		"""Returns the list of Clause tuples matching all given filters, e.g., all files using a package."""
+		query, parameters = self._filter("SELECT path, kind, name, line FROM clauses JOIN files ON clauses.file = files.id",
+																		 kind, name, path)
+		return [Clause(*row) for row in self.connection.execute(query + " ORDER BY path, line", parameters)]
+
+	@staticmethod
+	def _filter(query, kind, name, path):
+		conditions, parameters = [], []
+		for column, value in (("kind", kind), ("name", name), ("path", path)):
+			if value is not None:
+				conditions.append("{0} = ?".format(column))
+				parameters.append(value)
+		if conditions:
+			query += " WHERE " + " AND ".join(conditions)
+		return query, parameters
+
+
+if (__name__ == "__main__"):
+	argParser = ArgumentParser(description="Update and query the index of all VHDL design units in src/ and tb/.")
+	argParser.add_argument("--database", default=".poc_units.sqlite", help="Index file, default: .poc_units.sqlite")
+	argParser.add_argument("--root",     default="..",                help="Root directory of PoC, default: ..")
+	argParser.add_argument("--kind",     help="Only list units of this kind, e.g. entity or 'package body'.")
+	argParser.add_argument("name",       nargs="?", help="Only list units of this name.")
+	args = argParser.parse_args()
+
+	with DesignUnitIndex(args.database, args.root) as index:
+		parsed, removed = index.Update()
+		print("Index updated: {0} file(s) parsed, {1} file(s) removed.".format(parsed, removed))
+		for unit in index.Units(args.kind, args.name):
+			print("{0.Path}:{0.StartLine}-{1}: {0.Kind} {0.Name}{2}".format(unit, unit.EndLine or "?", " of {0}".format(unit.Parent) if unit.Parent else ""))
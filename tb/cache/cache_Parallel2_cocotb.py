@@ -33,6 +33,7 @@
 # ==============================================================================
 
 #import traceback
+import os
 import random
 
 import cocotb
@@ -45,12 +46,26 @@ from cocotb.regression import TestFactory
 from cocotb.scoreboard import Scoreboard
 from cocotb.result import TestFailure
 
-from lru_dict import LeastRecentlyUsedDict
-from utils import log2ceil
+from address_layout import addressLayout
+from bus_sampler import BusSampler
+from cache_model import CacheModel
+from cache_statistics import CacheStatistics
+from cache_stimulus import CacheStimulus, createMirror
+from expected_queue import ExpectedOutputQueue
+from golden_compare import GoldenOutputs, goldenEnabled
+from packed_layout import PackedLayout
+from profiler import createProfiler
+from replacement_policy import HARDWARE_POLICIES
+from soak import SoakControl
+from trace_file import TraceReader, TraceWriter
+from utils import optionValues, RingPool
 
 # debug level
 DEBUG=0
 
+# maximum number of expected transactions the model may run ahead of the DUT
+HIGH_WATER_MARK=16
+
 # ==============================================================================
 class InputDriver(BusDriver):
 	"""Drives inputs of DUT."""
@@ -64,44 +79,63 @@ class InputTransaction(object):
 	"""Transaction to be send by InputDriver"""
 	def __init__(self, tb, request=0, readWrite=0, invalidate=0, replace=0, address=0, cacheLineIn=0):
 		"tb must be an instance of the Testbench class"
+		self.Replace = BinaryValue(0, 1)
+		self.Request = BinaryValue(0, 1)
+		self.ReadWrite = BinaryValue(0, 1)
+		self.Invalidate = BinaryValue(0, 1)
+		self.Address = BinaryValue(0, tb.address_bits, False)
+		self.CacheLineIn = BinaryValue(0, tb.data_bits, False)
+		self.assign(request, readWrite, invalidate, replace, address, cacheLineIn)
+
+	def assign(self, request=0, readWrite=0, invalidate=0, replace=0, address=0, cacheLineIn=0):
+		"""Updates the integer payload in place, so that the BinaryValue objects can be reused."""
 		if (replace==1) and ((request==1) or (invalidate==1)):
-			raise ValueError("InputTransaction.__init__ called with request=%d, invalidate=%d, replace=%d"
-											 % request, invalidate, replace)
+			raise ValueError("InputTransaction.assign called with request=%d, invalidate=%d, replace=%d"
+											 % (request, invalidate, replace))
 
-		self.Replace = BinaryValue(replace, 1)
-		self.Request = BinaryValue(request, 1)
-		self.ReadWrite = BinaryValue(readWrite, 1)
-		self.Invalidate = BinaryValue(invalidate, 1)
-		self.Address = BinaryValue(address, tb.address_bits, False)
-		self.CacheLineIn = BinaryValue(cacheLineIn, tb.data_bits, False)
+		self.Replace.integer = replace
+		self.Request.integer = request
+		self.ReadWrite.integer = readWrite
+		self.Invalidate.integer = invalidate
+		self.Address.integer = address
+		self.CacheLineIn.integer = cacheLineIn
 
 
 class OutputTransaction(object):
-	"""Transaction to be expected / received by OutputMonitor."""
-	def __init__(self, tb=None, cacheLineOut=None, cacheHit=0, cacheMiss=0, oldAddress=None):
+	"""
+	Transaction to be expected / received by OutputMonitor.
+
+	The fields are stored packed in the layout Testbench.output_layout plus
+	a mask of the bits to compare.
+	"""
+	__slots__ = ("layout", "packed", "mask", "unknown")
+
+	def __init__(self, tb, cacheLineOut=None, cacheHit=0, cacheMiss=0, oldAddress=None):
 		"""For expected transactions, value 'None' means don't care. tb must be an instance of the Testbench class."""
-		if cacheLineOut is not None and isinstance(cacheLineOut, int): cacheLineOut = BinaryValue(cacheLineOut, tb.data_bits, False)
-		if cacheHit     is not None and isinstance(cacheHit, int):     cacheHit = BinaryValue(cacheHit, 1)
-		if cacheMiss    is not None and isinstance(cacheMiss, int):    cacheMiss = BinaryValue(cacheMiss, 1)
-		if oldAddress   is not None and isinstance(oldAddress, int):   oldAddress = BinaryValue(oldAddress, tb.address_bits, False)
-		self.value = (cacheLineOut, cacheHit, cacheMiss, oldAddress)
+		self.layout = tb.output_layout
+		self.packed, self.mask = self.layout.pack((cacheLineOut, cacheHit, cacheMiss, oldAddress))
+		self.unknown = 0
+
+	def assign(self, cacheLineOut, cacheHit, cacheMiss, oldAddress):
+		"""Updates a received transaction in place with the values read from the bus."""
+		self.packed, self.unknown = self.layout.resolve((cacheLineOut, cacheHit, cacheMiss, oldAddress))
+		self.mask = self.layout.full_mask
 
 	def __eq__(self, other):
 		if not isinstance(other, OutputTransaction):
 			raise ValueError("Other value in comparison is not an OutputTransaction, was {0!s} instead.".format(type(other)))
 
-		equal = True
-		for i, val1 in enumerate(self.value):
-			val2 = other.value[i]
-			if val1 is not None and val2 is not None:
-				if val1 != val2: equal = False
-		return equal
+		return (((self.packed ^ other.packed) | self.unknown | other.unknown) & self.mask & other.mask) == 0
 
 	def __ne__(self, other):
 		return not self.__eq__(other)
 
+	def diff(self, other):
+		"""Returns the names of all compared fields which differ."""
+		return self.layout.diff(self.packed, self.mask, self.unknown, other.packed, other.mask, other.unknown)
+
 	def __str__(self):
-		return ", ".join([str(i) for i in self.value])
+		return self.layout.format(self.packed, self.mask, self.unknown)
 
 # ==============================================================================
 class InputMonitor(BusMonitor):
@@ -111,6 +145,7 @@ class InputMonitor(BusMonitor):
 	def __init__(self, dut, callback=None, event=None):
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "in"
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -119,13 +154,11 @@ class InputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
-			vec = (self.bus.Request.value.integer,
-						 self.bus.ReadWrite.value.integer,
-						 self.bus.Invalidate.value.integer,
-						 self.bus.Replace.value.integer,
-						 self.bus.Address.value.integer,
-						 self.bus.CacheLineIn.value.integer)
-			self._recv(vec)
+			self._sample()
+
+	def _sample(self):
+		# copy, the sampler reuses its buffer for the next sample
+		self._recv(tuple(self._sampler.integers()))
 
 # ==============================================================================
 class OutputMonitor(BusMonitor):
@@ -134,9 +167,12 @@ class OutputMonitor(BusMonitor):
 
 	def __init__(self, dut, tb, callback=None, event=None):
 		"""tb must be an instance of the Testbench class."""
+		self.tb = tb
+		# the scoreboard compares synchronously, thus, one transaction object is sufficient
+		self._received = OutputTransaction(tb)
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "out"
-		self.tb = tb
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -145,19 +181,32 @@ class OutputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
+			self._sample()
 
-			self._recv(OutputTransaction(self.tb, self.bus.CacheLineOut.value, self.bus.CacheHit.value,
-																		self.bus.CacheMiss.value,	self.bus.OldAddress.value))
+	def _sample(self):
+		received = self._received
+		received.assign(*self._sampler.values())
+		if self.tb.golden is not None:
+			self.tb.golden.record(received.packed, received.unknown)
+		else:
+			self._recv(received)
 
 # ==============================================================================
 class Testbench(object):
 	class MyScoreboard(Scoreboard):
+		def __init__(self, dut, tb):
+			Scoreboard.__init__(self, dut)
+			self.tb = tb
+
 		def compare(self, got, exp, log, **_):
 			if got != exp:
 				self.errors += 1
-				log.error("Received transaction differed from expected output.")
+				log.error("Received transaction differed from expected output in field(s): {0}.".format(", ".join(exp.diff(got))))
 				log.warning("Expected: {0!s}.\nReceived: {1!s}.".format(exp, got))
 				if self._imm:
+					# save the trace of the failing run before the test is aborted
+					if self.tb.recorder is not None:
+						self.tb.recorder.close()
 					raise TestFailure("Received transaction differed from expected transaction.")
 
 
@@ -169,76 +218,82 @@ class Testbench(object):
 
 		cache_lines = dut.CACHE_LINES.value      # total number of cache lines
 		self.associativity = dut.ASSOCIATIVITY.value
-		self.cache_sets = cache_lines / self.associativity # number of cache sets
+		self.cache_sets = cache_lines // self.associativity # number of cache sets
 
-		self.index_bits = log2ceil(self.cache_sets)
-		tag_bits = self.address_bits - self.index_bits
+		# index and tag fields of an address, shared with stimulus generator and reference model
+		self.address_layout = addressLayout(self.address_bits, self.cache_sets)
+		self.index_bits = self.address_layout.index_bits
+		self.tag_bits = self.address_layout.tag_bits
 
-		self.index_mask = 2**self.index_bits-1
-		self.tag_mask = 2**tag_bits-1
+		self.index_mask = self.address_layout.index_mask
+		self.tag_mask = self.address_layout.tag_mask
 
 		if DEBUG: print("Testbench: {0}, {1}, {2}".format(self.index_bits, self.index_mask, self.tag_mask))
 
-		replacement_policy = dut.REPLACEMENT_POLICY.value
-		if replacement_policy != "LRU":
-			raise TestFailure("Unsupported configuration: REPLACEMENT_POLICY=%s" % replacement_policy)
+		# expected and received outputs are compared as packed integers
+		self.output_layout = PackedLayout((("CacheLineOut", self.data_bits), ("CacheHit", 1), ("CacheMiss", 1),
+																			 ("OldAddress", self.address_bits)))
+
+		self.replacement_policy = dut.REPLACEMENT_POLICY.value
+		if self.replacement_policy not in HARDWARE_POLICIES:
+			# RR and PLRU are model-only, there is no hardware to compare with
+			raise TestFailure("Unsupported configuration: REPLACEMENT_POLICY=%s" % self.replacement_policy)
 
-		# TODO: create LRU dictionary for each cache set
-		self.lrus = tuple([LeastRecentlyUsedDict(size_limit=self.associativity) for _ in range(self.cache_sets)])
+		# reference model with hit / miss statistics
+		try:
+			self.cache_model = CacheModel(self.address_bits, self.data_bits, cache_lines, self.associativity, self.replacement_policy,
+																		two_step_replace=True, statistics=CacheStatistics(self.cache_sets, self.associativity))
+		except ValueError as ex:
+			raise TestFailure("Unsupported configuration: REPLACEMENT_POLICY=%s (%s)" % (self.replacement_policy, ex))
+		self.lrus = self.cache_model.table # tag and data memory of all cache sets
+		self.statistics = self.cache_model.statistics
 
 		init_val = OutputTransaction(self)
 
+		# opt-in profiler of the Python callbacks, see run_test
+		self.profiler = createProfiler()
+
 		self.input_drv = InputDriver(dut)
 		self.output_mon = OutputMonitor(dut, self)
 
 		# Create a scoreboard on the outputs
-		self.expected_output = [ init_val ]
-		self.scoreboard = Testbench.MyScoreboard(dut)
+		self.expected_output = ExpectedOutputQueue([ init_val ], HIGH_WATER_MARK)
+		self.scoreboard = Testbench.MyScoreboard(dut, self)
 		self.scoreboard.add_interface(self.output_mon, self.expected_output)
 
 		# Reconstruct the input transactions from the pins
 		# and send them to our 'model'
-		self.input_mon = InputMonitor(dut, callback=self.model)
+		self.input_mon = InputMonitor(dut, callback=self.profiler.wrap("model", self.model))
+
+		self.profiler.instrument(self.input_mon, "_sample", "in._monitor_recv")
+		self.profiler.instrument(self.output_mon, "_sample", "out._monitor_recv")
+		self.profiler.instrument(self.scoreboard, "compare", "scoreboard.compare")
+
+		# precomputed outputs in golden mode, see precompute
+		self.golden = None
+		# trace recorder of the applied inputs, see run_test
+		self.recorder = None
+
+	def precompute(self, commands):
+		"""
+		Switch to golden mode: the expected outputs for the input tuples commands
+		are computed up front. Afterwards, the model and the scoreboard are
+		bypassed and the OutputMonitor only records the outputs.
+		"""
+		self.expected_output.pop(0) # initial output is part of the golden outputs
+		self.golden = GoldenOutputs(self.output_layout, [(None, 0, 0, None)] + self.cache_model.step_many(commands))
 
 	def model(self, transaction):
 		'''Model the DUT based on the input transaction.'''
-		request, readWrite, invalidate, replace, address, cacheLineIn = transaction
 		if DEBUG >= 1: print("=== model called with stopped={0!r}, Request={1}, ReadWrite={2}, Invalidate={3}, Replace={4}, Address={5}, CacheLineIn={6}".
-												 format(self.stopped, request, readWrite, invalidate, replace, address, cacheLineIn))
-
-		index = address & self.index_mask
-		#tag = (address >> self.index_bits) & self.tag_mask
-
-		# expected outputs, None means ignore
-		cacheLineOut, cacheHit, cacheMiss, oldAddress = None, 0, 0, None
-		if not self.stopped:
-			if request == 1:
-				if address in self.lrus[index]:
-					cacheHit = 1
-					if readWrite == 1:
-						self.lrus[index][address] = cacheLineIn
-					else:
-						cacheLineOut = self.lrus[index][address]
-						self.lrus[index][address] = cacheLineOut # move to recently-used position
-
-					if invalidate == 1:
-						del self.lrus[index][address]
-
-				else:
-					cacheMiss = 1
-
-			elif replace == 1:
-				if readWrite == 0: # step 1
-					# check if a valid cache line will be replaced
-					if len(self.lrus[index]) == self.associativity:
-						oldAddress, cacheLineOut = self.lrus[index].iteritems().next()
-
-				else: # step 2
-					# actual replace
-					self.lrus[index][address] = cacheLineIn
-
-			if DEBUG >= 1: print("=== model: lrus[{0}] = {1!s}".format(index, self.lrus[index].items()))
-			# convert all not None values to BinaryValue
+												 format(self.stopped, *transaction))
+
+		if not self.stopped and (self.golden is None):
+			# expected outputs, None means ignore
+			cacheLineOut, cacheHit, cacheMiss, oldAddress = self.cache_model.step(*transaction)
+			if DEBUG >= 1:
+				index, _ = self.address_layout.split(transaction[4])
+				print("=== model: lrus[{0}] = {1!s}".format(index, self.lrus.items(index)))
 			self.expected_output.append( OutputTransaction(self, cacheLineOut, cacheHit, cacheMiss, oldAddress) )
 
 	def stop(self):
@@ -251,59 +306,92 @@ class Testbench(object):
 
 
 # ==============================================================================
-def random_input_gen(tb,n=100000):
+def random_input_gen(tb,n=100000,golden=False,**options):
 	"""
 	Generate random input data to be applied by InputDriver.
-	Returns up to n instances of InputTransaction.
+	Returns up to n instances of InputTransaction (plus one per replace command).
 	tb must an instance of the Testbench class.
-	"""
-	address_high  = 2**tb.address_bits-1
-	data_high = 2**tb.data_bits-1
-
-	# it is forbidden to replace a cache line when the new address is already within the cache
-	# we cannot directly access the content of the LRU list in the testbench because this function is called asynchronously
-	lru_tags = tuple([LeastRecentlyUsedDict(size_limit=tb.associativity) for _ in range(tb.cache_sets)])
-
-	for i in range(n):
-		if DEBUG and (i % 1000 == 0): print("Generating transaction #{0} ...".format(i))
-
-		command = random.randint(1,60)
-		request, readWrite, invalidate, replace = 0, 0, 0, 0
-		# 10% for each possible command
-		if   command > 50: request = 1; readWrite = 0; invalidate = 0
-		elif command > 40: request = 1; readWrite = 1; invalidate = 0
-		elif command > 30: request = 1; readWrite = 0; invalidate = 1
-		elif command > 20: request = 1; readWrite = 1; invalidate = 1
-		elif command > 10: replace = 1
-
-		# Upon request, check if address is in LRU list.
-		while True:
-			address = random.randint(0,address_high)
-			index = address & tb.index_mask
-			tag = (address >> tb.index_bits) &  tb.tag_mask
-			#print "while loop: %d, %d, %d" % (address, index, tag)
-			if (replace == 0) or (tag not in lru_tags[index]): break
 
-		# Update LRU list
-		if request == 1:
-			if tag in lru_tags[index]:
-				if invalidate == 1:
-					del lru_tags[index][tag] # free cache line
-				else:
-					lru_tags[index][tag] = 1 # tag access
-		elif replace == 1:
-			lru_tags[index][tag] = 1 # allocate cache line
+	The whole stimulus is precomputed by CacheStimulus before the first
+	transaction is returned. The keyword arguments options (mix, working_set,
+	profile and fill) are passed to CacheStimulus. If golden is True, then
+	the expected outputs are precomputed too, see Testbench.precompute.
+	"""
+	stimulus = CacheStimulus(tb, n, two_step_replace=True, **options)
+	if DEBUG: print("Generated {0} transactions.".format(len(stimulus)))
+	if golden: tb.precompute(stimulus.rows())
 
-			#replace step 1:
-			yield InputTransaction(tb, request, 0, invalidate, replace, address, random.randint(0,data_high))
+	pool = RingPool(lambda: InputTransaction(tb))
+	for request, readWrite, invalidate, replace, address, cacheLineIn in stimulus.rows():
+		transaction = pool.get()
+		transaction.assign(request, readWrite, invalidate, replace, address, cacheLineIn)
+		yield transaction
 
-			#replace step 2:
-			readWrite = 1		# ... and continue below
+def trace_input_gen(tb, path, golden=False):
+	"""
+	Replay the input transactions recorded in the trace file path.
+	The trace is streamed in chunks, see TraceReader. If golden is True, then
+	the expected outputs are precomputed in a first pass over the trace.
+	tb must an instance of the Testbench class.
+	"""
+	trace = TraceReader(path)
+	if (trace.address_bits != tb.address_bits) or (trace.data_bits != tb.data_bits):
+		raise TestFailure("Trace '%s' was recorded with %d address and %d data bits." % (path, trace.address_bits, trace.data_bits))
+	if len(trace) == 0:
+		raise TestFailure("Trace '%s' is empty." % path)
+	if DEBUG: print("Replaying {0} transactions.".format(len(trace)))
+	if golden: tb.precompute(trace.rows())
+
+	pool = RingPool(lambda: InputTransaction(tb))
+	for row in trace.rows():
+		transaction = pool.get()
+		transaction.assign(*row)
+		yield transaction
 
-		if DEBUG >= 2: print("=== random_input_gen: request={0}, readWrite={1}, invalidate={2}, replace={3}, address={4}".format(request, readWrite, invalidate, replace, address))
-		if DEBUG >= 2: print("=== random_input_gen: lru_tags[{0}]={1!s}".format(index, lru_tags[index].items()))
+@cocotb.coroutine
+def soak_test(tb, soak, options):
+	"""
+	Issue random transactions in chunks until the budget of the soak run is
+	exhausted. The state of the model is checkpointed after each chunk.
 
-		yield InputTransaction(tb, request, readWrite, invalidate, replace, address, random.randint(0,data_high))
+	Upon resume, the checkpointed cache lines are replaced into the empty
+	cache first, so that DUT, model and stimulus mirror start from the same
+	state. Then, the random stream continues from the checkpoint.
+	"""
+	mirror = createMirror(tb)
+	sync = False
+	state = soak.load()
+	if state is not None:
+		random.setstate(state["random"])
+		tb.scoreboard.errors += state["errors"]
+		for address, data in state["lines"]:
+			index, tag = tb.address_layout.split(address)
+			mirror.replace(index, mirror.victim(index), tag)
+			# replace step 1 and 2
+			yield tb.input_drv.send(InputTransaction(tb, replace=1, address=address, cacheLineIn=data), sync)
+			yield tb.input_drv.send(InputTransaction(tb, readWrite=1, replace=1, address=address, cacheLineIn=data))
+			sync = True
+
+	pool = RingPool(lambda: InputTransaction(tb))
+	n = soak.chunk()
+	while n > 0:
+		stimulus = CacheStimulus(tb, n, two_step_replace=True, mirror=mirror, **options)
+		for row in tb.profiler.iterate("input_gen", stimulus.rows()):
+			transaction = pool.get()
+			transaction.assign(*row)
+			yield tb.input_drv.send(transaction, sync)
+			sync = True
+
+		# Apply idle command until the model has seen the last transaction of this chunk.
+		yield tb.input_drv.send(InputTransaction(tb))
+		yield RisingEdge(tb.dut.Clock)
+		join = tb.address_layout.join
+		lines = [(join(index, tag), data) for index, tag, data in tb.lrus.snapshot()]
+		soak.save(n, {"random": random.getstate(), "errors": tb.scoreboard.errors, "lines": lines})
+		if DEBUG: print("Soak: {0} transactions completed.".format(soak.cycle))
+		n = soak.chunk()
+
+	soak.finish()
 
 @cocotb.coroutine
 def clock_gen(signal):
@@ -314,29 +402,74 @@ def clock_gen(signal):
 		yield Timer(5000) # ps
 
 @cocotb.coroutine
-def run_test(dut):
+def run_test(dut, mix="uniform", working_set=None, profile="uniform", fill=0):
 	cocotb.fork(clock_gen(dut.Clock))
+	options = {"mix": mix, "working_set": working_set, "profile": profile, "fill": bool(fill)}
+	test = "-".join(str(options[key]).replace(":", "_") for key in ("mix", "working_set", "profile", "fill"))
 	tb = Testbench(dut)
 	dut.Reset <= 0
 
-	input_gen = random_input_gen(tb)
-
-	# Issue first transaction immediately.
-	yield tb.input_drv.send(input_gen.next(), False)
-
-	# Issue next transactions.
-	for t in input_gen:
-		yield tb.input_drv.send(t)
-
-	# Wait for rising-edge of clock to execute last transaction from above.
-	# Apply idle command in following clock cycle, but stop generation of expected output data.
-	# Finish clock cycle to capture the resulting output from the last transaction above.
-	yield tb.input_drv.send(InputTransaction(tb))
-	tb.stop()
-	yield RisingEdge(dut.Clock)
+	# Record the applied inputs into the directory TB_TRACE_RECORD.
+	# The trace is also written if the run fails, so that it can be replayed.
+	recorder = None
+	if os.environ.get("TB_TRACE_RECORD"):
+		recorder = TraceWriter(os.path.join(os.environ["TB_TRACE_RECORD"], "cache_Parallel2-%s.trace" % test), tb.address_bits, tb.data_bits)
+		tb.input_mon.add_callback(recorder)
+		tb.recorder = recorder
+
+	try:
+		soak = SoakControl("cache_Parallel2")
+		if os.environ.get("TB_TRACE_REPLAY"):
+			input_gen = trace_input_gen(tb, os.environ["TB_TRACE_REPLAY"], goldenEnabled())
+		elif soak.enabled:
+			input_gen = None
+			yield soak_test(tb, soak, options)
+		else:
+			input_gen = random_input_gen(tb, golden=goldenEnabled(), **options)
+
+		if input_gen is not None:
+			input_gen = tb.profiler.iterate("input_gen", input_gen)
+
+			# Issue first transaction immediately.
+			yield tb.input_drv.send(input_gen.next(), False)
+
+			# Issue next transactions.
+			for t in input_gen:
+				yield tb.input_drv.send(t)
+
+		# Wait for rising-edge of clock to execute last transaction from above.
+		# Apply idle command in following clock cycle, but stop generation of expected output data.
+		# Finish clock cycle to capture the resulting output from the last transaction above.
+		yield tb.input_drv.send(InputTransaction(tb))
+		tb.stop()
+		yield RisingEdge(dut.Clock)
+	finally:
+		if recorder is not None:
+			recorder.close()
+
+	# Dump hit / miss statistics of this test.
+	path = tb.statistics.dump("cache_Parallel2-%s" % test, {"options": options, "generics": {
+		"ADDR_BITS": tb.address_bits, "DATA_BITS": tb.data_bits, "CACHE_LINES": tb.cache_sets * tb.associativity,
+		"ASSOCIATIVITY": tb.associativity, "REPLACEMENT_POLICY": tb.replacement_policy}})
+	if path is not None: dut._log.info("Statistics written to {0}.".format(path))
+
+	# Dump the time spent in the Python callbacks, one output sample per clock cycle.
+	cycles = tb.profiler.calls("out._monitor_recv")
+	path = tb.profiler.dump("cache_Parallel2-%s" % test, cycles)
+	if path is not None: dut._log.info("Profile written to {0}.\n{1}".format(path, tb.profiler.format(cycles)))
+
+	# Compare the recorded outputs in golden mode.
+	if tb.golden is not None:
+		tb.scoreboard.errors += tb.golden.compare(dut._log)
 
 	# Print result of scoreboard.
 	raise tb.scoreboard.result
 
+# test options are selected by the environment variables TB_OPTION_MIX, TB_OPTION_WORKING_SET,
+# TB_OPTION_PROFILE and TB_OPTION_FILL
 factory = TestFactory(run_test)
+factory.add_option("mix", optionValues("mix", "uniform"))
+factory.add_option("working_set", optionValues("working_set", None, int))
+factory.add_option("profile", optionValues("profile", "uniform"))
+factory.add_option("fill", optionValues("fill", 0, int))
 factory.generate_tests()
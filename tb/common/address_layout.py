@@ -0,0 +1,82 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Address layout of the Cocotb cache testbenches
+#
+# Description:
+# ------------------------------------
+#	Splits cache line addresses into cache set index (lower bits) and tag
+#	(upper bits), and joins them again. Bit widths and masks are computed
+#	once per cache geometry.
+#
+#	split and join work on single addresses, splitArray and joinArray on
+#	whole NumPy arrays of addresses, including object arrays for addresses
+#	wider than 64 bits.
+#
+#	addressLayout returns one shared instance per geometry, so that
+#	testbench, stimulus generator and reference model use the same object.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from utils import bitMask, log2ceil
+
+class AddressLayout(object):
+	"""Index and tag fields of a cache line address."""
+	__slots__ = ("address_bits", "index_bits", "tag_bits", "index_mask", "tag_mask")
+
+	def __init__(self, address_bits, cache_sets):
+		self.address_bits = address_bits
+		self.index_bits =   log2ceil(cache_sets)
+		self.tag_bits =     address_bits - self.index_bits
+		self.index_mask =   bitMask(self.index_bits)
+		self.tag_mask =     bitMask(self.tag_bits)
+
+	def split(self, address):
+		"""Returns the tuple (index, tag) of address."""
+		return address & self.index_mask, (address >> self.index_bits) & self.tag_mask
+
+	def join(self, index, tag):
+		"""Returns the address of tag in cache set index."""
+		return (tag << self.index_bits) | index
+
+	def splitArray(self, addresses):
+		"""Returns the arrays (indexes, tags) of the NumPy array addresses."""
+		return addresses & self.index_mask, (addresses >> self.index_bits) & self.tag_mask
+
+	def joinArray(self, indexes, tags):
+		"""Returns the array of addresses of the NumPy arrays tags and indexes."""
+		return (tags << self.index_bits) | indexes
+
+	def __repr__(self):
+		return "AddressLayout(address_bits={0}, index_bits={1}, tag_bits={2})".format(self.address_bits, self.index_bits, self.tag_bits)
+
+
+_layouts = {}
+
+def addressLayout(address_bits, cache_sets):
+	"""Returns the shared AddressLayout of this cache geometry."""
+	key = (address_bits, cache_sets)
+	layout = _layouts.get(key)
+	if layout is None:
+		layout = _layouts[key] = AddressLayout(address_bits, cache_sets)
+	return layout
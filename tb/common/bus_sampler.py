@@ -0,0 +1,64 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Sampling of bus signals in the monitors of the Cocotb testbenches
+#
+# Description:
+# ------------------------------------
+#	Reads all signals of a bus once per clock cycle. The signal handles are
+#	resolved once when the sampler is created, and the sampled values are
+#	stored into a buffer which is reused in every clock cycle. Thus,
+#	sampling does neither look up attributes of the bus nor allocate a new
+#	container.
+#
+#	The buffer is overwritten by the next sample. Receivers which keep the
+#	sampled values beyond the current clock cycle must copy them.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+class BusSampler(object):
+	"""Samples the signals of a Cocotb bus in the given order."""
+	__slots__ = ("names", "_handles", "_buffer")
+
+	def __init__(self, bus, signals):
+		"""bus is the bus of a BusMonitor, signals the list of signal names, e.g. BusMonitor._signals."""
+		self.names =    tuple(signals)
+		self._handles = tuple(enumerate(getattr(bus, name) for name in signals))
+		self._buffer =  [None] * len(self.names)
+
+	def __len__(self):
+		return len(self.names)
+
+	def values(self):
+		"""Returns the buffer filled with the current values (BinaryValue objects) of all signals."""
+		buffer = self._buffer
+		for i, handle in self._handles:
+			buffer[i] = handle.value
+		return buffer
+
+	def integers(self):
+		"""Returns the buffer filled with the current integer values of all signals."""
+		buffer = self._buffer
+		for i, handle in self._handles:
+			buffer[i] = handle.value.integer
+		return buffer
@@ -0,0 +1,247 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Cycle-accurate reference models of the PoC caches and LRU lists
+#
+# Description:
+# ------------------------------------
+#	Reference models of PoC.cache.par, PoC.cache.par2,
+#	PoC.sort.lru_cache and PoC.sort.lru_list, independent of Cocotb and of the
+#	simulator.
+#
+#	Each model computes the outputs of one clock cycle from the inputs of the
+#	same clock cycle by step. step_many applies a whole sequence of input
+#	tuples and returns the list of outputs, e.g., to precompute golden
+#	outputs or to evaluate the hit rate of other generics offline. Outputs
+#	which are don't care are returned as None. The inner loop of
+#	CacheModel.step_many accesses the arrays of SetAssociativeTable directly.
+#
+#	Running this file prints the throughput of the models. With CPython 3.11,
+#	the models apply about 0.5 to 1.3 million transactions per second,
+#	CacheModel with LRU about 0.7 to 0.9 million. Each transaction depends
+#	on the state left by the previous one, thus step_many is a plain Python
+#	loop and is not vectorized.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from address_layout import addressLayout
+from cache_table import SetAssociativeTable
+from lru_dict import LeastRecentlyUsedDict
+from lru_list import LeastRecentlyUsedList
+from replacement_policy import createPolicy
+
+class CacheModel(object):
+	"""
+	Model of PoC.cache.par, or of PoC.cache.par2 if two_step_replace is True.
+
+	Inputs are tuples (request, readWrite, invalidate, replace, address,
+	cacheLineIn), outputs are tuples (cacheLineOut, cacheHit, cacheMiss,
+	oldAddress).
+	"""
+
+	def __init__(self, address_bits, data_bits, cache_lines, associativity, replacement_policy="LRU",
+							 two_step_replace=False, statistics=None):
+		"""
+		The parameters match the generics of the cache. An unsupported
+		replacement_policy raises ValueError. statistics is an optional instance
+		of cache_statistics.CacheStatistics which is updated on every step.
+		"""
+		self.address_bits =     address_bits
+		self.data_bits =        data_bits
+		self.associativity =    associativity
+		self.cache_sets =       cache_lines // associativity
+		self.address_layout =   addressLayout(address_bits, self.cache_sets)
+		self.index_bits =       self.address_layout.index_bits
+		self.tag_bits =         self.address_layout.tag_bits
+		self.index_mask =       self.address_layout.index_mask
+		self.tag_mask =         self.address_layout.tag_mask
+		self.two_step_replace = two_step_replace
+		self.statistics =       statistics
+
+		# tag and data memory of all cache sets
+		policy =                createPolicy(replacement_policy, self.cache_sets, associativity)
+		self.table =            SetAssociativeTable(self.cache_sets, associativity, self.tag_bits, data_bits, policy)
+
+	def step(self, request, readWrite, invalidate, replace, address, cacheLineIn):
+		"""Applies the inputs of one clock cycle and returns the expected outputs of this cycle."""
+		return self.step_many(((request, readWrite, invalidate, replace, address, cacheLineIn),))[0]
+
+	def step_many(self, commands):
+		"""Applies the input tuples commands, one per clock cycle, and returns the list of output tuples."""
+		# all attributes are bound to local variables, the way lookup is inlined
+		index_bits, index_mask, tag_mask = self.index_bits, self.index_mask, self.tag_mask
+		ways, two_step_replace, statistics = self.associativity, self.two_step_replace, self.statistics
+		table = self.table
+		valid, tags, data = table.valid, table.tags, table.data
+		access, victim = table.policy.access, table.policy.victim
+
+		outputs = []
+		append = outputs.append
+		for request, readWrite, invalidate, replace, address, cacheLineIn in commands:
+			index = address & index_mask
+			cacheLineOut, oldAddress = None, None
+			if statistics is not None:
+				statistics.cycle()
+
+			if request == 1:
+				tag = (address >> index_bits) & tag_mask
+				base = index * ways
+				for slot in range(base, base + ways):
+					if valid[slot] and tags[slot] == tag: break
+				else:
+					slot = -1
+				if statistics is not None:
+					statistics.request(index, readWrite, slot >= 0)
+
+				if slot < 0:
+					append((None, 0, 1, None))
+					continue
+
+				if readWrite == 1:
+					data[slot] = cacheLineIn
+				else:
+					cacheLineOut = data[slot]
+				access(index, slot - base) # move to recently-used position
+
+				if invalidate == 1:
+					table.invalidate(index, slot - base)
+					if statistics is not None:
+						statistics.invalidate(index)
+				append((cacheLineOut, 1, 0, None))
+
+			elif replace == 1:
+				way = victim(index)
+				slot = index * ways + way
+				if (readWrite == 0) or not two_step_replace: # step 1 of PoC.cache.par2
+					# check if a valid cache line will be replaced
+					if valid[slot]:
+						oldAddress = (tags[slot] << index_bits) | index
+						cacheLineOut = data[slot]
+
+				if (readWrite == 1) or not two_step_replace: # step 2 of PoC.cache.par2
+					# actual replace
+					if statistics is not None:
+						statistics.replace(index, valid[slot] == 1)
+					table.replace(index, way, (address >> index_bits) & tag_mask, cacheLineIn)
+				append((cacheLineOut, 0, 0, oldAddress))
+
+			else:
+				append((None, 0, 0, None))
+
+		return outputs
+
+
+class LeastRecentlyUsedCacheModel(object):
+	"""
+	Model of PoC.sort.lru_cache.
+
+	Inputs are tuples (insert, free, keyIn), the output is the least-recently
+	used key.
+	"""
+
+	def __init__(self, elements):
+		self.elements = elements
+		self.lru =      LeastRecentlyUsedDict(size_limit=elements)
+
+		# initial state of LRU list
+		for keyin in range(elements-1, -1, -1):
+			self.lru[keyin] = 1
+
+	def step(self, insert, free, keyin):
+		"""Applies the inputs of one clock cycle and returns KeyOut of this cycle."""
+		if insert == 1:
+			self.lru[keyin] = 1
+		elif free == 1:
+			self.lru.moveLRU(keyin)
+		return self.lru.peekLRU()[0]
+
+	def step_many(self, commands):
+		"""Applies the input tuples commands, one per clock cycle, and returns the list of outputs."""
+		step = self.step
+		return [step(*command) for command in commands]
+
+
+class LeastRecentlyUsedListModel(object):
+	"""
+	Model of PoC.sort.lru_list.
+
+	Inputs are tuples (insert, remove, dataIn), the key is stored in the
+	lower key_bits of dataIn. The output is the tuple (valid, dataOut) of the
+	least-recently used element. The elements are held in a
+	LeastRecentlyUsedList, so that all operations are O(1) for any number of
+	elements.
+	"""
+
+	def __init__(self, elements, key_bits=4):
+		self.elements = elements
+		self.key_mask = 2**key_bits - 1
+		self.lru =      LeastRecentlyUsedList(elements)
+
+	def step(self, insert, remove, datain):
+		"""Applies the inputs of one clock cycle and returns (Valid, DataOut) of this cycle."""
+		keyin = datain & self.key_mask
+		lru = self.lru
+		if insert == 1:
+			lru[keyin] = datain
+		elif remove == 1:
+			if keyin in lru: del lru[keyin]
+
+		if len(lru) < 1:
+			return 0, 0
+		return 1, lru.peekLRU()[1]
+
+	def step_many(self, commands):
+		"""Applies the input tuples commands, one per clock cycle, and returns the list of outputs."""
+		step = self.step
+		return [step(*command) for command in commands]
+
+
+if __name__ == "__main__":
+	# Throughput of the models for random commands, see the header for typical figures.
+	import random
+	from timeit import default_timer
+
+	ops = 200000
+	print("{0:<40} {1:>14}".format("model", "transactions/s"))
+	for policy in ("LRU", "RR", "PLRU"):
+		for lines, associativity in ((64, 4), (1024, 8), (65536, 16)):
+			model = CacheModel(32, 32, lines, associativity, policy)
+			commands = []
+			for _ in range(ops):
+				address = random.getrandbits(12)
+				if random.random() < 0.3:
+					commands.append((0, 0, 0, 1, address, random.getrandbits(32)))
+				else:
+					commands.append((1, random.getrandbits(1), int(random.random() < 0.1), 0, address, random.getrandbits(32)))
+			start = default_timer()
+			model.step_many(commands)
+			name = "CacheModel({0}, {1}, {2})".format(lines, associativity, policy)
+			print("{0:<40} {1:>14,.0f}".format(name, ops / (default_timer() - start)))
+
+	for model, commands in ((LeastRecentlyUsedCacheModel(32), [(1, 0, random.randrange(32)) for _ in range(ops)]),
+													(LeastRecentlyUsedListModel(16), [(1, 0, random.randrange(256)) for _ in range(ops)]),
+													(LeastRecentlyUsedListModel(1024, 10), [(1, 0, random.randrange(4096)) for _ in range(ops)])):
+		start = default_timer()
+		model.step_many(commands)
+		name = "{0}({1})".format(type(model).__name__, model.elements)
+		print("{0:<40} {1:>14,.0f}".format(name, ops / (default_timer() - start)))
@@ -0,0 +1,138 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Hit / miss statistics of the Cocotb cache reference models
+#
+# Description:
+# ------------------------------------
+#	Counts hits, misses, evictions, fills and invalidations per cache set, as
+#	reported by the reference model of a cache testbench. Additionally, a
+#	histogram per cache set records for how many clock cycles the set held
+#	0 to ways valid cache lines.
+#
+#	All counters are stored in flat preallocated arrays. The occupancy
+#	histogram is only updated when the occupancy of a set changes, so that
+#	the overhead per clock cycle is constant.
+#
+#	dump writes the file <name>_statistics.json into the directory selected by
+#	the environment variable TB_STATISTICS. If it is unset or empty, then no
+#	file is written.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import json
+import os
+from array import array
+
+# counted events
+EVENTS = ("reads", "writes", "hits", "misses", "fills", "evictions", "invalidations")
+
+class CacheStatistics(object):
+	"""Event counters and occupancy histograms of a set-associative cache."""
+
+	def __init__(self, sets, ways):
+		self.sets =      sets
+		self.ways =      ways
+		self.cycles =    0
+		for event in EVENTS:
+			setattr(self, event, array("L", [0]) * sets)
+		self.occupancy = array("L", [0]) * sets           # current number of valid cache lines per set
+		self.changed =   array("L", [0]) * sets           # cycle of the last occupancy change per set
+		self.histogram = array("L", [0]) * (sets * (ways + 1))
+
+	def cycle(self):
+		"""Advances the clock cycle counter, call once per modelled clock cycle."""
+		self.cycles += 1
+
+	def request(self, index, readWrite, hit):
+		"""Counts a read (readWrite = 0) or write (readWrite = 1) request to set index."""
+		if readWrite == 1:
+			self.writes[index] += 1
+		else:
+			self.reads[index] += 1
+		if hit:
+			self.hits[index] += 1
+		else:
+			self.misses[index] += 1
+
+	def replace(self, index, evicted):
+		"""Counts a replace in set index. evicted is True if a valid cache line has been replaced."""
+		if evicted:
+			self.evictions[index] += 1
+		else:
+			self.fills[index] += 1
+			self._occupy(index, 1)
+
+	def invalidate(self, index):
+		"""Counts the invalidation of a valid cache line in set index."""
+		self.invalidations[index] += 1
+		self._occupy(index, -1)
+
+	def _occupy(self, index, delta):
+		occupancy = self.occupancy[index]
+		self.histogram[index * (self.ways + 1) + occupancy] += self.cycles - self.changed[index]
+		self.changed[index] =   self.cycles
+		self.occupancy[index] = occupancy + delta
+
+	def asDict(self):
+		"""Returns all counters as a dictionary of totals, per-set lists and occupancy histograms."""
+		stride =     self.ways + 1
+		histograms = []
+		for index in range(self.sets):
+			histogram = self.histogram[index * stride:(index + 1) * stride].tolist()
+			histogram[self.occupancy[index]] += self.cycles - self.changed[index]
+			histograms.append(histogram)
+
+		totals = dict((event, sum(getattr(self, event))) for event in EVENTS)
+		requests = totals["hits"] + totals["misses"]
+		return {
+			"sets":       self.sets,
+			"ways":       self.ways,
+			"cycles":     self.cycles,
+			"totals":     totals,
+			"hit_rate":   (float(totals["hits"]) / requests) if requests > 0 else None,
+			"per_set":    dict((event, getattr(self, event).tolist()) for event in EVENTS),
+			"occupancy":  {
+				"per_set":  histograms,
+				"total":    [sum(histogram[count] for histogram in histograms) for count in range(stride)]
+			}
+		}
+
+	def dump(self, name, extra=None, environ=os.environ):
+		"""
+		Writes the statistics as JSON file and returns its path, or None if the
+		environment variable TB_STATISTICS is not set. name identifies the
+		testbench and test, extra is a dictionary of additional entries, e.g. the
+		generics and test options.
+		"""
+		directory = environ.get("TB_STATISTICS")
+		if not directory:
+			return None
+
+		path =   os.path.join(directory, name + "_statistics.json")
+		result = self.asDict()
+		if extra is not None:
+			result.update(extra)
+		with open(path, "w") as statisticsFile:
+			json.dump(result, statisticsFile, indent=2, sort_keys=True)
+		return path
@@ -0,0 +1,356 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Precomputed stimulus for the Cocotb cache testbenches
+#
+# Description:
+# ------------------------------------
+#	Generates the complete command, address and data stream of a cache
+#	testbench run up front as NumPy arrays.
+#
+#	All random numbers are drawn in bulk. The generator keeps a mirror of the
+#	cache content to ensure that a replaced address is not already within the
+#	cache. The new tag is drawn directly from the free tags of the cache set,
+#	so that no rejection sampling is required. Driving the bus only indexes
+#	into the precomputed arrays.
+#
+#	The addresses follow one of the profiles in ADDRESS_PROFILES, so that the
+#	hit paths of the cache can be stressed at realistic rates:
+#	* uniform:        uniformly distributed addresses (default)
+#	* sequential:RUN  consecutive cache lines, a new stream starts every RUN commands
+#	* strided:STRIDE  one stream with a distance of STRIDE cache lines
+#	* zipf:S          Zipfian hot set with exponent S (default 1.0)
+#	* sweep:START     working set doubles from START cache lines up to the
+#	                  whole window, in phases of equal length
+#	All profiles are drawn from the window selected by working_set.
+#
+#	With fill, i.e., every miss is followed by a replace of the missing
+#	address, and a window of W cache line addresses for a cache of L lines,
+#	the requests of the "read" mix hit the LRU cache at about these rates
+#	(measured for L = 32 to 1024 and W = 4*L):
+#	* uniform:        L/W, about 25 %; no hits for a large address space without window
+#	* sequential:     no hits, each pass over the window evicts the lines before
+#	                  they are requested again; sequential:RUN hits at the uniform rate
+#	* strided:        about 80 % if the W/STRIDE addresses of a pass fit into the
+#	                  cache sets they map to, else no hits (conflict misses)
+#	* zipf:           the highest rate, about 50 to 60 % (20 to 40 % without window)
+#	* sweep:          about 60 %, most hits in the early phases while the working
+#	                  set fits into the cache, the uniform rate in the last phase
+#	Thus, sequential and conflicting strides stress the miss and replace
+#	paths, zipf, sweep and fitting strides the hit paths.
+#
+#	Requires NumPy.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import random
+from bisect import bisect_right
+
+import numpy as np
+
+try:
+	from math import gcd
+except ImportError:
+	from fractions import gcd
+
+from address_layout import addressLayout
+from cache_table import SetAssociativeTable
+from replacement_policy import createPolicy
+
+def randomBits(rng, bits, n):
+	"""
+	Returns n uniformly distributed random numbers in the range 0 to 2**bits-1.
+	Numbers wider than 63 bits are returned as an array of Python integers.
+	"""
+	if bits <= 63:
+		return rng.randint(0, 1 << bits, size=n, dtype=np.int64)
+
+	result = np.zeros(n, dtype=object)
+	for _ in range((bits + 31) // 32):
+		result = (result << 32) | rng.randint(0, 1 << 32, size=n, dtype=np.int64).astype(object)
+	return result & ((1 << bits) - 1)
+
+
+def randomBelow(rng, size, n):
+	"""Returns n uniformly distributed random numbers in the range 0 to size-1."""
+	if size < (1 << 63):
+		return rng.randint(0, size, size=n, dtype=np.int64)
+	elif (size & (size - 1)) == 0:
+		return randomBits(rng, size.bit_length() - 1, n)
+	else:
+		return randomBits(rng, size.bit_length() + 32, n) % size
+
+
+def sweepPhases(n, size, start):
+	"""
+	Returns the phases of the sweep profile as a list of tuples (first command,
+	working set size). The working set doubles from start up to size.
+	"""
+	sizes = [max(1, min(int(start), size))]
+	while sizes[-1] < size:
+		sizes.append(min(sizes[-1] * 2, size))
+	return [((i * n) // len(sizes), phaseSize) for i, phaseSize in enumerate(sizes)]
+
+
+def _uniformProfile(rng, n, size, lines, parameter):
+	return randomBelow(rng, size, n)
+
+def _stridedStreams(rng, n, size, run, stride):
+	command = np.arange(n, dtype=np.int64)
+	starts =  randomBelow(rng, size, (n + run - 1) // run)
+	offsets = (command % run) * stride
+	if size >= (1 << 31):
+		offsets = offsets.astype(object)
+	return (starts[command // run] + offsets) % size
+
+def _sequentialProfile(rng, n, size, lines, run):
+	return _stridedStreams(rng, n, size, max(1, int(run or n)), 1)
+
+def _stridedProfile(rng, n, size, lines, stride):
+	return _stridedStreams(rng, n, size, max(1, n), int(stride or 8) % size)
+
+def _zipfProfile(rng, n, size, lines, exponent):
+	# the rank is drawn by the inverse of the continuous Zipf distribution
+	s =       1.0 if exponent is None else exponent
+	u =       rng.random_sample(n)
+	x =       float(size) ** u if s == 1.0 else ((float(size) ** (1.0 - s) - 1.0) * u + 1.0) ** (1.0 / (1.0 - s))
+	rank =    np.clip(np.floor(x) - 1, 0, min(size, 1 << 53) - 1).astype(np.int64)
+	# scatter the hot ranks over the window by a random multiplier which is coprime to size
+	scatter = 1 + 2 * int(rng.randint(0, 1 << 30))
+	while gcd(scatter, size) != 1:
+		scatter += 2
+	offset =  int(randomBelow(rng, size, 1)[0])
+	if size >= (1 << 31):
+		rank, scatter = rank.astype(object), scatter % size
+	return (rank * scatter + offset) % size
+
+def _sweepProfile(rng, n, size, lines, start):
+	phases =  sweepPhases(n, size, start or max(1, lines // 4))
+	offsets = np.zeros(n, dtype=np.int64 if size < (1 << 63) else object)
+	for (first, phaseSize), (last, _) in zip(phases, phases[1:] + [(n, None)]):
+		offsets[first:last] = randomBelow(rng, phaseSize, last - first)
+	return offsets
+
+# address profiles: function(rng, n, size, cache lines, parameter) returning n offsets within the window
+ADDRESS_PROFILES = {
+	"uniform":    _uniformProfile,
+	"sequential": _sequentialProfile,
+	"strided":    _stridedProfile,
+	"zipf":       _zipfProfile,
+	"sweep":      _sweepProfile
+}
+
+def parseProfile(profile):
+	"""Splits the profile specification "NAME" or "NAME:PARAMETER" into (NAME, PARAMETER or None)."""
+	name, _, parameter = profile.partition(":")
+	if name not in ADDRESS_PROFILES:
+		raise ValueError("Unknown address profile '{0}'.".format(name))
+	return name, (float(parameter) if parameter else None)
+
+
+# command encoding: (Request, ReadWrite, Invalidate, Replace)
+COMMANDS = np.array([
+	(1, 0, 0, 0), # read
+	(1, 1, 0, 0), # write
+	(1, 0, 1, 0), # read and invalidate
+	(1, 1, 1, 0), # write and invalidate
+	(0, 0, 0, 1), # replace
+	(0, 0, 0, 0)  # idle
+], dtype=np.uint8)
+
+# transaction mixes: relative weights of the commands above
+COMMAND_MIXES = {
+	"uniform":      (1, 1, 1, 1, 1, 1),
+	"read":         (6, 1, 1, 1, 1, 0),
+	"write":        (1, 6, 1, 1, 1, 0),
+	"replace":      (1, 1, 1, 1, 6, 0),
+	"noinvalidate": (3, 3, 0, 0, 3, 1)
+}
+
+def createMirror(tb):
+	"""Returns an empty tag-only model of the cache, tb must be an instance of the Testbench class."""
+	return SetAssociativeTable(tb.cache_sets, tb.associativity, tb.tag_bits, 0,
+														 createPolicy(tb.replacement_policy, tb.cache_sets, tb.associativity))
+
+
+class CacheStimulus(object):
+	"""
+	Random stimulus for PoC.cache.par and PoC.cache.par2.
+
+	Each of the arrays request, readWrite, invalidate, replace, address and
+	cacheLineIn holds one column of the transaction stream.
+	"""
+
+	def __init__(self, tb, n, two_step_replace=False, rng=None, mirror=None, mix="uniform", working_set=None,
+							 profile="uniform", fill=False):
+		"""
+		Generates n random commands. tb must be an instance of the Testbench
+		class. If two_step_replace is True, then each replace is split into two
+		transactions as required by PoC.cache.par2. rng is a NumPy RandomState,
+		by default it is seeded from the Python random module so that the
+		stimulus follows the seed of the Cocotb test run. mirror is the cache
+		mirror returned by createMirror. Pass the same mirror to generate
+		consecutive chunks of one transaction stream.
+
+		mix selects the relative frequency of the commands from COMMAND_MIXES.
+		If working_set is given, then all addresses are drawn from a window of
+		this many consecutive cache line addresses, otherwise from the whole
+		address space. profile selects the address distribution within this
+		window from ADDRESS_PROFILES, see the module description for the
+		resulting hit rates. A replace of an address which is already
+		in the cache is redirected to a free tag of the same cache set within
+		the active working set of the sweep profile, or else within the window.
+		Only if the window holds no free tag of this set, the tag is drawn from
+		the whole address space. If fill is True, then each request which
+		misses the cache (without invalidate) is followed by a replace of the
+		requested address, like a cache controller would do.
+
+		The list phases holds tuples (first transaction, working set size) of the
+		sweep profile, and a single entry for the other profiles.
+		"""
+		if rng is None:
+			rng = np.random.RandomState(random.getrandbits(32))
+		profileName, parameter = parseProfile(profile)
+
+		self.tag_space = 1 << tb.tag_bits
+
+		weights =    np.array(COMMAND_MIXES[mix], dtype=np.float64)
+		command =    COMMANDS[rng.choice(len(COMMANDS), size=n, p=weights / weights.sum())]
+		request, readWrite, invalidate, replace = [command[:, i].copy() for i in range(4)]
+
+		address_space = 1 << tb.address_bits
+		window =   address_space if (working_set is None) or (working_set >= address_space) else working_set
+		address =  ADDRESS_PROFILES[profileName](rng, n, window, tb.cache_sets * tb.associativity, parameter)
+		base =     0
+		if window < address_space:
+			# window of working_set consecutive cache line addresses at a random position
+			base =    min(int(rng.random_sample() * (address_space - window + 1)), address_space - window)
+			address = address + base if tb.address_bits <= 63 else address.astype(object) + base
+		phases =   sweepPhases(n, window, parameter or max(1, tb.cache_sets * tb.associativity // 4)) if profileName == "sweep" else [(0, window)]
+		layout =     addressLayout(tb.address_bits, tb.cache_sets)
+		index, tag = layout.splitArray(address)
+		freeDraw =   rng.random_sample(n)
+		phaseFirst = [first for first, _ in phases]
+
+		# it is forbidden to replace a cache line when the new address is already within the cache
+		# the mirror of the cache content is updated in the same order as the DUT will see the commands
+		if mirror is None:
+			mirror = createMirror(tb)
+		tags, indexes, replaces, fills = tag.tolist(), index.tolist(), replace.tolist(), [False] * n
+		for i, (req, inv, rep, idx) in enumerate(zip(request.tolist(), invalidate.tolist(), replaces, indexes)):
+			if req == 1:
+				way = mirror.lookup(idx, tags[i])
+				if way >= 0:
+					if inv == 1:
+						mirror.invalidate(idx, way) # free cache line
+					else:
+						mirror.update(idx, way) # tag access
+				elif fill and (inv == 0):
+					fills[i] = True # load missing cache line in the next transaction
+					mirror.replace(idx, mirror.victim(idx), tags[i])
+			elif rep == 1:
+				newTag = tags[i]
+				if mirror.lookup(idx, newTag) >= 0:
+					# the active window of the sweep profile grows with each phase
+					active = phases[bisect_right(phaseFirst, i) - 1][1]
+					newTag = self._freeTag(mirror, idx, freeDraw[i], layout.index_bits, base, (active, window))
+				if newTag is None:
+					replaces[i] = 0 # all tags are in use, issue idle command instead
+				else:
+					tags[i] = newTag
+					mirror.replace(idx, mirror.victim(idx), newTag) # allocate cache line
+
+		replace = np.array(replaces, dtype=np.uint8)
+		address = layout.joinArray(index, np.array(tags, dtype=address.dtype))
+
+		columns = [request, readWrite, invalidate, replace, address, randomBits(rng, tb.data_bits, n)]
+		if fill:
+			# insert a replace of the same address after each missing request
+			columns, phases, inserted = self._expand(columns, phases, np.array(fills, dtype=bool))
+			for column in columns[:3]:
+				column[inserted] = 0
+			columns[3][inserted] = 1
+
+		if two_step_replace:
+			# step 1 reads the old cache line (ReadWrite = 0), step 2 writes the new one (ReadWrite = 1)
+			columns, phases, inserted = self._expand(columns, phases, columns[3] == 1)
+			columns[1][inserted - 1] = 0
+			columns[1][inserted] =     1
+
+		self.phases = phases
+		self.request, self.readWrite, self.invalidate, self.replace, self.address, self.cacheLineIn = columns
+
+	@staticmethod
+	def _expand(columns, phases, duplicate):
+		"""
+		Repeats each transaction for which duplicate is True. Returns the new
+		columns, the phases moved accordingly, and the positions of the copies.
+		"""
+		counts =   1 + duplicate.astype(np.intp)
+		first =    np.cumsum(counts) - counts
+		columns =  [np.repeat(column, counts) for column in columns]
+		phases =   [(int(first[row]) if row < len(first) else len(columns[0]), size) for row, size in phases]
+		return columns, phases, first[duplicate] + 1
+
+	def _freeTag(self, mirror, index, draw, index_bits, base, windows):
+		"""
+		Maps the uniform random number draw in [0, 1) to a tag which is not
+		within cache set index. The tag is drawn from the tags whose address
+		lies in the first of the windows (sizes in cache line addresses starting
+		at base) which has a free tag of this set, or else from the whole tag
+		space. Returns None if all tags are in use.
+		"""
+		resident = sorted(tag for _, tag, _ in mirror.items(index))
+		for window in windows:
+			# tags of the first and last address of cache set index within the window
+			first = max(0, -((index - base) >> index_bits))
+			last =  (base + window - 1 - index) >> index_bits
+			tag =   self._nthFreeTag(resident, first, last - first + 1, draw)
+			if tag is not None:
+				return tag
+		return self._nthFreeTag(resident, 0, self.tag_space, draw)
+
+	@staticmethod
+	def _nthFreeTag(resident, first, count, draw):
+		"""
+		Maps draw to one of the count tags starting at first which is not in the
+		sorted list resident. Returns None if there is no such tag.
+		"""
+		resident = [tag for tag in resident if first <= tag < first + count]
+		free = count - len(resident)
+		if free <= 0:
+			return None
+
+		# select the n-th free tag by skipping all resident tags below it
+		tag = first + min(int(draw * free), free - 1)
+		for residentTag in resident:
+			if residentTag > tag: break
+			tag += 1
+		return tag
+
+	def __len__(self):
+		return len(self.request)
+
+	def rows(self):
+		"""Returns the transactions as tuples (request, readWrite, invalidate, replace, address, cacheLineIn) of Python integers."""
+		return zip(*[column.tolist() for column in (self.request, self.readWrite, self.invalidate, self.replace, self.address, self.cacheLineIn)])
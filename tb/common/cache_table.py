@@ -0,0 +1,129 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Set-associative cache table used by the Cocotb cache testbenches
+#
+# Description:
+# ------------------------------------
+#	Provides a compact model of the tag and data memories of a set-associative
+#	cache. The replacement policy is modelled by one of the classes in
+#	replacement_policy.py, LRU is the default.
+#
+#	Tag, data and valid bit of every cache line as well as the replacement
+#	state are stored in flat preallocated arrays indexed by "set * ways + way",
+#	so that even caches with 64K lines need only a handful of Python objects.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from replacement_policy import createPolicy
+from utils import preallocate
+
+
+class SetAssociativeTable(object):
+	"""
+	Tag and data memory of a set-associative cache.
+
+	Cache lines are addressed by (index, way). The way to replace next is
+	selected by the replacement policy model.
+	"""
+	__slots__ = ("sets", "ways", "valid", "tags", "data", "policy")
+
+	def __init__(self, sets, ways, tag_bits, data_bits, policy=None):
+		"""
+		sets and ways specify the cache geometry, tag_bits and data_bits the
+		bit width of the stored tags and cache lines. policy is an instance of
+		replacement_policy.ReplacementPolicy and defaults to LRU.
+		"""
+		size = sets * ways
+		self.sets =   sets
+		self.ways =   ways
+		self.valid =  bytearray(size)
+		self.tags =   preallocate(tag_bits, size)
+		self.data =   preallocate(data_bits, size)
+		self.policy = createPolicy("LRU", sets, ways) if policy is None else policy
+
+	def lookup(self, index, tag):
+		"""Returns the way holding tag in cache set index, or -1 on a miss."""
+		base = index * self.ways
+		valid, tags = self.valid, self.tags
+		for slot in range(base, base + self.ways):
+			if valid[slot] and tags[slot] == tag:
+				return slot - base
+		return -1
+
+	def isValid(self, index, way):
+		"""Returns True if the cache line (index, way) is valid."""
+		return self.valid[index * self.ways + way] == 1
+
+	def tag(self, index, way):
+		"""Returns the tag of cache line (index, way)."""
+		return self.tags[index * self.ways + way]
+
+	def read(self, index, way):
+		"""Returns the content of cache line (index, way) without marking it as used."""
+		return self.data[index * self.ways + way]
+
+	def update(self, index, way, data=None):
+		"""
+		Marks cache line (index, way) as accessed.
+		If data is specified, then the content of the cache line is updated too.
+		"""
+		if data is not None:
+			self.data[index * self.ways + way] = data
+		self.policy.access(index, way)
+
+	def invalidate(self, index, way):
+		"""Invalidates the cache line (index, way)."""
+		self.valid[index * self.ways + way] = 0
+		self.policy.invalidate(index, way)
+
+	def victim(self, index):
+		"""Returns the way which will be replaced next in cache set index."""
+		return self.policy.victim(index)
+
+	def items(self, index):
+		"""Returns the (way, tag, data) tuples of all valid cache lines in set index."""
+		base = index * self.ways
+		return [(slot - base, self.tags[slot], self.data[slot]) for slot in range(base, base + self.ways) if self.valid[slot]]
+
+	def snapshot(self):
+		"""
+		Returns the (index, tag, data) tuples of all valid cache lines, ordered
+		so that replacing them into an empty cache restores the replacement
+		order (see ReplacementPolicy.age).
+		"""
+		lines = []
+		for slot in range(self.sets * self.ways):
+			if self.valid[slot]:
+				index, way = divmod(slot, self.ways)
+				lines.append((self.policy.age(index, way), index, self.tags[slot], self.data[slot]))
+		lines.sort(key=lambda line: line[0])
+		return [line[1:] for line in lines]
+
+	def replace(self, index, way, tag, data=0):
+		"""Stores tag and data in cache line (index, way) and marks it as valid."""
+		slot = index * self.ways + way
+		self.valid[slot] = 1
+		self.tags[slot] =  tag
+		self.data[slot] =  data
+		self.policy.insert(index, way)
@@ -0,0 +1,284 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Script:		  Run Cocotb testbenches with many seeds in parallel
+#
+# Description:
+# ------------------------------------
+#	Launches independent simulator processes in a process pool. Each shard
+#	runs one random seed with one generic configuration in its own working
+#	directory. The Cocotb results (results.xml) of all shards are collected
+#	into one summary.
+#
+#	The simulator is started by a command template with the placeholders:
+#
+#	* {python}:   Python interpreter running this script
+#	* {root}:     PoC root directory
+#	* {module}:   entity under test and name of its testbench, e.g. cache_Parallel
+#	* {seed}:     random seed of this shard
+#	* {workdir}:  working directory of this shard
+#	* {tempdir}:  temporary directory of this shard, {workdir}/tmp
+#	* {generics}: generics of this shard as "-gNAME=VALUE" arguments, one
+#	              argument per generic if the placeholder is a word of its own
+#	* {builddir}: directory of the elaborated simulation model, see cocotb_sweep.py
+#
+#	Each command is executed in {workdir} with the environment variables
+#	RANDOM_SEED and COCOTB_RESULTS_FILE set for the shard, and TMPDIR, TMP and
+#	TEMP set to {tempdir}.
+#
+#	The template is split into words before the placeholders are replaced, so
+#	that paths may contain spaces. The default command runs cocotb_simulate.py,
+#	which simulates in {workdir}. The runner refuses --generics without
+#	{generics} in the template, and --jobs greater than 1 without {workdir} or
+#	{tempdir} in the template, because such a simulator would share its
+#	working directory between the shards.
+#
+#	Example:
+#		python cocotb_runner.py --module cache_Parallel --seeds 16 --jobs 8 \
+#			--generics CACHE_LINES=64,ASSOCIATIVITY=4 --generics CACHE_LINES=1024,ASSOCIATIVITY=8 \
+#			--command "{python} {root}/tb/common/cocotb_simulate.py {module} --simulator ghdl --workdir {workdir} {generics}"
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import print_function
+
+import json
+import os
+import shlex
+import subprocess
+import sys
+from argparse import ArgumentParser
+from multiprocessing import Pool, cpu_count
+from string import Formatter
+from timeit import default_timer
+from xml.etree import ElementTree
+
+POC_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DEFAULT_COMMAND = "{python} {root}/tb/common/cocotb_simulate.py {module} --workdir {workdir} {generics}"
+
+
+class Shard(object):
+	"""One simulator run: a module with one seed and one generic configuration."""
+
+	def __init__(self, number, module, seed, generics, command, outputDirectory, environ=None, builddir=""):
+		self.number =   number
+		self.module =   module
+		self.seed =     seed
+		self.generics = generics
+		self.command =  command
+		self.environ =  {} if environ is None else environ
+		self.builddir = builddir
+		self.workdir =  os.path.abspath(os.path.join(outputDirectory, "{0}-{1:04d}-seed{2}".format(module, number, seed)))
+		self.tempdir =  os.path.join(self.workdir, "tmp")
+
+	def genericArguments(self):
+		return ["-g{0}={1}".format(name, value) for name, value in sorted(self.generics.items())]
+
+	def arguments(self):
+		"""Returns the command line of this shard."""
+		values = {"python": sys.executable, "root": POC_ROOT, "module": self.module, "seed": self.seed, "workdir": self.workdir,
+							"tempdir": self.tempdir, "generics": " ".join(self.genericArguments()), "builddir": self.builddir}
+		arguments = []
+		for word in shlex.split(self.command):
+			if word == "{generics}":
+				arguments.extend(self.genericArguments())
+			else:
+				arguments.append(word.format(**values))
+		return arguments
+
+
+class ShardResult(object):
+	"""Outcome of a shard as read from its Cocotb results file."""
+
+	def __init__(self, shard, returncode, duration, tests, failures, failed):
+		self.number =     shard.number
+		self.module =     shard.module
+		self.seed =       shard.seed
+		self.generics =   shard.generics
+		self.options =    dict((name[len("TB_OPTION_"):].lower(), value) for name, value in shard.environ.items() if name.startswith("TB_OPTION_"))
+		self.workdir =    shard.workdir
+		self.returncode = returncode
+		self.duration =   duration
+		self.tests =      tests
+		self.failures =   failures
+		self.failed =     failed
+
+	@property
+	def passed(self):
+		return (self.returncode == 0) and (self.tests > 0) and (self.failures == 0)
+
+	def asDict(self):
+		return {
+			"shard":      self.number,
+			"module":     self.module,
+			"seed":       self.seed,
+			"generics":   self.generics,
+			"options":    self.options,
+			"workdir":    self.workdir,
+			"returncode": self.returncode,
+			"duration":   self.duration,
+			"tests":      self.tests,
+			"failures":   self.failures,
+			"failed":     self.failed,
+			"passed":     self.passed
+		}
+
+
+def readResults(resultsFile):
+	"""Returns (tests, failures, names of failed tests) of a Cocotb results.xml, or (0, 0, []) if missing."""
+	if not os.path.exists(resultsFile):
+		return 0, 0, []
+
+	tests, failed = 0, []
+	for testcase in ElementTree.parse(resultsFile).getroot().iter("testcase"):
+		tests += 1
+		if (testcase.find("failure") is not None) or (testcase.find("error") is not None):
+			failed.append(testcase.get("name"))
+	return tests, len(failed), failed
+
+
+def runShard(shard):
+	"""Runs one shard in its working directory. Executed by the worker processes."""
+	if not os.path.isdir(shard.tempdir):
+		os.makedirs(shard.tempdir)
+	resultsFile = os.path.join(shard.workdir, "results.xml")
+	if os.path.exists(resultsFile):
+		os.remove(resultsFile)
+
+	environ = dict(os.environ)
+	environ.update(shard.environ)
+	environ["RANDOM_SEED"] =         str(shard.seed)
+	environ["COCOTB_RESULTS_FILE"] = resultsFile
+	for name in ("TMPDIR", "TMP", "TEMP"):
+		environ[name] =                shard.tempdir
+
+	start = default_timer()
+	with open(os.path.join(shard.workdir, "simulation.log"), "w") as logFile:
+		try:
+			returncode = subprocess.call(shard.arguments(), cwd=shard.workdir, env=environ, stdout=logFile, stderr=subprocess.STDOUT)
+		except OSError as ex:
+			logFile.write("Cannot launch simulator: {0!s}\n".format(ex))
+			returncode = -1
+	duration = default_timer() - start
+
+	tests, failures, failed = readResults(resultsFile)
+	return ShardResult(shard, returncode, duration, tests, failures, failed)
+
+
+def runShards(shards, jobs):
+	"""Runs all shards on jobs worker processes. Returns the results ordered by shard number."""
+	pool = Pool(jobs)
+	try:
+		results = list(pool.imap_unordered(runShard, shards))
+	finally:
+		pool.close()
+		pool.join()
+	return sorted(results, key=lambda result: result.number)
+
+
+def printSummary(results, out=sys.stdout):
+	"""Prints one line per shard plus a total, returns True if all shards passed."""
+	for result in results:
+		print("{0:>4}  {1:<6} seed={2:<10} {3:>7.1f} s  tests={4} failures={5}  {6}".format(
+			result.number, "PASS" if result.passed else "FAIL", result.seed, result.duration, result.tests, result.failures,
+			",".join("{0}={1}".format(name, value) for name, value in sorted(list(result.generics.items()) + list(result.options.items())))), file=out)
+		if not result.passed:
+			print("      see {0}".format(os.path.join(result.workdir, "simulation.log")), file=out)
+
+	passed = sum(1 for result in results if result.passed)
+	print("{0} of {1} shards passed.".format(passed, len(results)), file=out)
+	return passed == len(results)
+
+
+def parseGenerics(text):
+	"""Parses "NAME=VALUE,NAME=VALUE" into a dictionary."""
+	generics = {}
+	for assignment in text.split(","):
+		if assignment.strip() == "": continue
+		name, value = assignment.split("=", 1)
+		generics[name.strip()] = value.strip()
+	return generics
+
+
+def placeholders(template):
+	"""Returns the set of placeholder names of a command template."""
+	return set(name for _, name, _, _ in Formatter().parse(template) if name)
+
+
+def checkArguments(parser, args, elaborate=None):
+	"""
+	Exits via parser.error if the command templates cannot run the requested
+	shards. elaborate is the template which receives the generics, it defaults
+	to the simulator command. Sets args.jobs if it was not given.
+	"""
+	if any(text.strip() for text in args.generics) and ("generics" not in placeholders(elaborate or args.command)):
+		parser.error("--generics requires a {generics} placeholder in the command template, otherwise all shards "
+								 "simulate the generics of the PoC configuration")
+
+	isolated = bool(placeholders(args.command) & set(["workdir", "tempdir"]))
+	if args.jobs is None:
+		args.jobs = cpu_count() if isolated else 1
+	elif (args.jobs > 1) and not isolated:
+		parser.error("--jobs {0} requires a {{workdir}} or {{tempdir}} placeholder in the command template, otherwise the "
+								 "shards share the simulator's working directory".format(args.jobs))
+
+
+def createArgumentParser():
+	parser = ArgumentParser(description="Run a Cocotb testbench with many seeds and generic configurations in parallel.")
+	parser.add_argument("--module",   required=True,          help="entity under test and name of its testbench, e.g. cache_Parallel")
+	parser.add_argument("--command",  default=DEFAULT_COMMAND, help="simulator command template")
+	parser.add_argument("--seeds",    type=int, default=cpu_count(), help="number of seeds per generic configuration")
+	parser.add_argument("--seed",     type=int, default=1,    help="first seed")
+	parser.add_argument("--generics", action="append", default=[], metavar="NAME=VALUE,...",
+											help="generic configuration, can be given multiple times")
+	parser.add_argument("--jobs",     type=int, default=None, help="number of parallel simulator processes, default: number "
+											"of CPUs, or 1 if the command template has no {workdir} or {tempdir}")
+	parser.add_argument("--output",   default=os.path.join(POC_ROOT, "temp", "cocotb_runner"), help="output directory")
+	parser.add_argument("--summary",  default=None,           help="write the summary as JSON to this file")
+	return parser
+
+
+def main(argv=None):
+	parser = createArgumentParser()
+	args =   parser.parse_args(argv)
+	checkArguments(parser, args)
+
+	configurations = [parseGenerics(text) for text in args.generics] or [{}]
+	shards = []
+	for generics in configurations:
+		for seed in range(args.seed, args.seed + args.seeds):
+			shards.append(Shard(len(shards), args.module, seed, generics, args.command, args.output))
+
+	print("Running {0} shards on {1} processes...".format(len(shards), args.jobs))
+	results = runShards(shards, args.jobs)
+	allPassed = printSummary(results)
+
+	if args.summary is not None:
+		with open(args.summary, "w") as summaryFile:
+			json.dump([result.asDict() for result in results], summaryFile, indent=2, sort_keys=True)
+
+	return 0 if allPassed else 1
+
+if (__name__ == "__main__"):
+	sys.exit(main())
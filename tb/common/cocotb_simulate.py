@@ -0,0 +1,165 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Script:		  Run one Cocotb testbench of PoC
+#
+# Description:
+# ------------------------------------
+#	Simulates the testbench tb/<namespace>/<MODULE>_cocotb.py with the entity
+#	<MODULE> as toplevel, e.g., MODULE = cache_Parallel. This is the default
+#	simulator command of cocotb_runner.py.
+#
+#	The VHDL sources of PoC are collected from the OSVVM build scripts
+#	PoC.pro and src/**/build.pro in build order, for vendor "GENERIC", i.e.,
+#	all vendor-specific blocks ("if { ... }") are skipped. All files are
+#	compiled into the library PoC.
+#
+#	A Makefile for Cocotb's makefile flow is written into the working
+#	directory and make is executed there. Thus, the simulator build
+#	directory (sim_build) and all other files of the run are kept in the
+#	working directory. Cocotb is located by the environment variable COCOTB,
+#	or else by cocotb-config. Generics are passed as -gNAME=VALUE in SIM_ARGS,
+#	as expected by GHDL.
+#
+#	Example:
+#		python cocotb_simulate.py cache_Parallel --workdir temp/cache_Parallel -gCACHE_LINES=64 -gASSOCIATIVITY=4
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import print_function
+
+import glob
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+POC_ROOT =   os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+COMMON_DIR = os.path.join(POC_ROOT, "tb", "common")
+
+MAKEFILE = """\
+# generated by cocotb_simulate.py
+SIM ?= {simulator}
+TOPLEVEL_LANG = vhdl
+RTL_LIBRARY = poc
+GHDL_ARGS ?= --std=08
+TOPLEVEL = {toplevel}
+MODULE = {module}
+VHDL_SOURCES = {sources}
+SIM_ARGS += {generics}
+
+{include}
+"""
+
+
+def configurationFiles(board="GENERIC"):
+	"""Returns the project and local configuration files which are analyzed by src/build.pro."""
+	projectFile = os.path.join(COMMON_DIR, "project_configuration_{0}.vhdl".format(board))
+	localFile =   os.path.join(COMMON_DIR, "local_configuration.vhdl")
+	if not os.path.exists(localFile):
+		localFile = os.path.join(POC_ROOT, "src", "common", "local_configuration.vhdl.template")
+	return {"projectConfigurationFile": projectFile, "localConfigurationFile": localFile}
+
+
+def buildSources(path, variables, sources=None):
+	"""
+	Returns the list of VHDL files analyzed by the OSVVM build script path and
+	the scripts it includes. variables maps the names of the $::poc::
+	variables used in analyze commands to their values.
+	"""
+	if sources is None:
+		sources = []
+	directory = os.path.dirname(path)
+	depth = 0   # nesting level of the skipped vendor-specific blocks
+	with open(path, "r") as scriptFile:
+		for line in scriptFile:
+			line = line.split("#", 1)[0].strip()
+			if line == "":
+				continue
+			if (depth > 0) or line.startswith("if"):
+				depth += line.count("{") - line.count("}")
+				continue
+
+			command, _, argument = line.partition(" ")
+			argument = argument.strip()
+			for name, value in variables.items():
+				argument = argument.replace("$::poc::" + name, value)
+			target = os.path.normpath(os.path.join(directory, argument))
+			if command == "include":
+				if os.path.isdir(target):
+					target = os.path.join(target, "build.pro")
+				buildSources(target, variables, sources)
+			elif command == "analyze":
+				sources.append(target)
+	return sources
+
+
+def findTestbench(module):
+	"""Returns the path of the Cocotb testbench of module."""
+	paths = glob.glob(os.path.join(POC_ROOT, "tb", "*", module + "_cocotb.py"))
+	if not paths:
+		raise ValueError("No Cocotb testbench '{0}_cocotb.py' in {1}.".format(module, os.path.join(POC_ROOT, "tb")))
+	return paths[0]
+
+
+def writeMakefile(path, module, simulator, generics, board="GENERIC"):
+	"""Writes the Makefile of the Cocotb makefile flow to path."""
+	if os.environ.get("COCOTB"):
+		include = "include $(COCOTB)/makefiles/Makefile.inc\ninclude $(COCOTB)/makefiles/Makefile.sim"
+	else:
+		include = "include $(shell cocotb-config --makefiles)/Makefile.sim"
+	sources = buildSources(os.path.join(POC_ROOT, "PoC.pro"), configurationFiles(board))
+	with open(path, "w") as makefile:
+		makefile.write(MAKEFILE.format(simulator=simulator, toplevel=module.lower(), module=module + "_cocotb",
+																	 sources=" \\\n\t".join(sources), generics=" ".join("-g" + generic for generic in generics),
+																	 include=include))
+
+
+def main(argv=None):
+	parser = ArgumentParser(description="Simulate one Cocotb testbench of PoC.")
+	parser.add_argument("module",       help="entity under test and name of its testbench, e.g. cache_Parallel")
+	parser.add_argument("--simulator",  default="ghdl", help="Cocotb simulator, default: ghdl")
+	parser.add_argument("--board",      default="GENERIC", help="board of the project configuration, default: GENERIC")
+	parser.add_argument("--workdir",    default=".", help="working directory of the simulation")
+	parser.add_argument("-g",           dest="generics", action="append", default=[], metavar="NAME=VALUE",
+											help="generic of the toplevel, can be given multiple times")
+	args = parser.parse_args(argv)
+
+	try:
+		testbench = findTestbench(args.module)
+	except ValueError as ex:
+		parser.error(str(ex))
+
+	workdir = os.path.abspath(args.workdir)
+	if not os.path.isdir(workdir):
+		os.makedirs(workdir)
+	makefile = os.path.join(workdir, "Makefile")
+	writeMakefile(makefile, args.module, args.simulator, args.generics, args.board)
+
+	environ = dict(os.environ)
+	environ["PYTHONPATH"] = os.pathsep.join([os.path.dirname(testbench), COMMON_DIR] +
+																					([environ["PYTHONPATH"]] if environ.get("PYTHONPATH") else []))
+	return subprocess.call(["make", "-f", makefile], cwd=workdir, env=environ)
+
+if (__name__ == "__main__"):
+	sys.exit(main())
@@ -0,0 +1,177 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Script:		  Sweep Cocotb testbenches over generics and test options
+#
+# Description:
+# ------------------------------------
+#	Enumerates all combinations of generic configurations, test options and
+#	seeds and schedules them as shards on worker processes (see
+#	cocotb_runner.py).
+#
+#	Test options are passed to the testbench by the environment variables
+#	TB_OPTION_<NAME>, which the cache testbenches forward to their Cocotb
+#	TestFactory (e.g. mix and working_set).
+#
+#	If a build command template is given, then the simulation model is
+#	elaborated once per generic configuration into its own build directory,
+#	which is passed as {builddir} to the run command. A build is reused by
+#	later sweeps as long as the generics, the build command and the VHDL
+#	sources are unchanged. With a build command, the generics need a
+#	{generics} placeholder only in the build command.
+#
+#	Example:
+#		python cocotb_sweep.py --module cache_Parallel --seeds 4 \
+#			--generics CACHE_LINES=64,ASSOCIATIVITY=4 --generics CACHE_LINES=1024,ASSOCIATIVITY=8 \
+#			--option mix=uniform,read,replace --option working_set=None,64,4096 \
+#			--build "<elaborate command using {generics} and {builddir}>" \
+#			--command "<run command using {builddir} and {workdir}>"
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from itertools import product
+from multiprocessing import Pool
+
+from cocotb_runner import POC_ROOT, Shard, ShardResult, checkArguments, createArgumentParser, parseGenerics, printSummary, runShard
+
+BUILD_STAMP = "build.stamp"
+
+
+class Build(object):
+	"""Elaborated simulation model of one generic configuration."""
+
+	def __init__(self, module, generics, command, outputDirectory, sourcesKey):
+		self.module =   module
+		self.generics = generics
+		self.command =  command
+		key =           json.dumps([module, sorted(generics.items()), command], sort_keys=True)
+		self.builddir = os.path.abspath(os.path.join(outputDirectory, "builds", hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]))
+		self.stamp =    hashlib.sha1((key + sourcesKey).encode("utf-8")).hexdigest()
+
+	def isCurrent(self):
+		"""Returns True if the build directory holds a build of the same generics and sources."""
+		stampFile = os.path.join(self.builddir, BUILD_STAMP)
+		if not os.path.exists(stampFile):
+			return False
+		with open(stampFile, "r") as stampHandle:
+			return stampHandle.read().strip() == self.stamp
+
+
+def sourcesKey(directories=("src", "tb")):
+	"""Returns a hash over path, size and modification time of all VHDL sources."""
+	entries = []
+	for directory in directories:
+		for dirpath, dirnames, filenames in os.walk(os.path.join(POC_ROOT, directory)):
+			dirnames.sort()
+			for filename in sorted(filenames):
+				if filename.endswith((".vhdl", ".vhd")):
+					path = os.path.join(dirpath, filename)
+					status = os.stat(path)
+					entries.append("{0}:{1}:{2}".format(os.path.relpath(path, POC_ROOT), status.st_size, int(status.st_mtime)))
+	return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+def runBuild(build):
+	"""Elaborates one generic configuration unless a current build exists. Returns (builddir, returncode)."""
+	if build.isCurrent():
+		return build.builddir, 0
+
+	if not os.path.isdir(build.builddir):
+		os.makedirs(build.builddir)
+	shard = Shard(0, build.module, 0, build.generics, build.command, build.builddir, builddir=build.builddir)
+	with open(os.path.join(build.builddir, "build.log"), "w") as logFile:
+		try:
+			returncode = subprocess.call(shard.arguments(), cwd=build.builddir, stdout=logFile, stderr=subprocess.STDOUT)
+		except OSError as ex:
+			logFile.write("Cannot launch build: {0!s}\n".format(ex))
+			returncode = -1
+
+	if returncode == 0:
+		with open(os.path.join(build.builddir, BUILD_STAMP), "w") as stampHandle:
+			stampHandle.write(build.stamp)
+	return build.builddir, returncode
+
+
+def parseOption(text):
+	"""Parses "NAME=VALUE,VALUE,..." into (NAME, [VALUE, ...])."""
+	name, values = text.split("=", 1)
+	return name.strip(), [value.strip() for value in values.split(",")]
+
+
+def main(argv=None):
+	parser = createArgumentParser()
+	parser.description = "Sweep a Cocotb testbench over generic configurations, test options and seeds."
+	parser.add_argument("--option", action="append", default=[], metavar="NAME=VALUE,...",
+											help="test option and its values, can be given multiple times")
+	parser.add_argument("--build",  default=None, help="build command template, executed once per generic configuration")
+	args = parser.parse_args(argv)
+	checkArguments(parser, args, args.build)
+
+	configurations = [parseGenerics(text) for text in args.generics] or [{}]
+	options =        [parseOption(text) for text in args.option]
+	pool =           Pool(args.jobs)
+	try:
+		# elaborate each generic configuration once, in parallel
+		builds = {}
+		if args.build is not None:
+			key = sourcesKey()
+			pending = [Build(args.module, generics, args.build, args.output, key) for generics in configurations]
+			print("Elaborating {0} generic configurations...".format(len(pending)))
+			for generics, (builddir, returncode) in zip(configurations, pool.map(runBuild, pending)):
+				builds[json.dumps(generics, sort_keys=True)] = (builddir, returncode)
+
+		shards, failedBuilds = [], []
+		for generics in configurations:
+			builddir, returncode = builds.get(json.dumps(generics, sort_keys=True), ("", 0))
+			for values in product(*[optionValues for _, optionValues in options]):
+				environ = dict(("TB_OPTION_" + name.upper(), value) for (name, _), value in zip(options, values))
+				for seed in range(args.seed, args.seed + args.seeds):
+					shard = Shard(len(shards), args.module, seed, generics, args.command, args.output, environ, builddir)
+					shards.append(shard)
+					if returncode != 0:
+						failedBuilds.append(ShardResult(shard, returncode, 0.0, 0, 0, []))
+
+		skipped =  set(result.number for result in failedBuilds)
+		runnable = [shard for shard in shards if shard.number not in skipped]
+		print("Running {0} shards on {1} processes...".format(len(runnable), args.jobs))
+		results = sorted(list(pool.imap_unordered(runShard, runnable)) + failedBuilds, key=lambda result: result.number)
+	finally:
+		pool.close()
+		pool.join()
+
+	allPassed = printSummary(results)
+	if args.summary is not None:
+		with open(args.summary, "w") as summaryFile:
+			json.dump([result.asDict() for result in results], summaryFile, indent=2, sort_keys=True)
+
+	return 0 if allPassed else 1
+
+if (__name__ == "__main__"):
+	sys.exit(main())
@@ -0,0 +1,87 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Bounded queue of expected transactions for Cocotb scoreboards
+#
+# Description:
+# ------------------------------------
+#	Provides a FIFO which can be passed as expected output to
+#	cocotb.scoreboard.Scoreboard.add_interface instead of a list.
+#
+#	Popping from the front is O(1). If the model runs ahead of the DUT by more
+#	than the high-water mark, a TestFailure is raised with a diagnostic
+#	message, so that long runs keep flat memory.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from collections import deque
+
+from cocotb.result import TestFailure
+
+class ExpectedOutputQueue(object):
+	"""
+	FIFO of expected transactions with the list interface used by the Cocotb
+	scoreboard: append, pop(0), len, indexing and iteration.
+	"""
+	__slots__ = ("_queue", "high_water_mark", "max_level", "appended")
+
+	def __init__(self, initial=(), high_water_mark=None):
+		"""
+		initial holds the transactions expected first. If high_water_mark is not
+		None, then at most this many transactions may be pending.
+		"""
+		self._queue =          deque()
+		self.high_water_mark = high_water_mark
+		self.max_level =       0
+		self.appended =        0
+		for item in initial:
+			self.append(item)
+
+	def append(self, item):
+		"""Appends an expected transaction. Raises TestFailure if the high-water mark is exceeded."""
+		queue = self._queue
+		queue.append(item)
+		self.appended += 1
+		level = len(queue)
+		if level > self.max_level:
+			self.max_level = level
+			if (self.high_water_mark is not None) and (level > self.high_water_mark):
+				raise TestFailure("Model ran ahead of the DUT by {0} transactions (high-water mark {1}) at expected transaction #{2}. "
+													"Oldest pending transaction: {3!s}".format(level, self.high_water_mark, self.appended - 1, queue[0]))
+
+	def pop(self, index=0):
+		"""Removes and returns the transaction at index, which is O(1) for the front."""
+		if index == 0:
+			return self._queue.popleft()
+		item = self._queue[index]
+		del self._queue[index]
+		return item
+
+	def __len__(self):
+		return len(self._queue)
+
+	def __getitem__(self, index):
+		return self._queue[index]
+
+	def __iter__(self):
+		return iter(self._queue)
@@ -0,0 +1,134 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Precomputed golden outputs for the Cocotb testbenches
+#
+# Description:
+# ------------------------------------
+#	In golden mode, the expected outputs of a testbench are computed by the
+#	reference model before the simulation starts. During the simulation, the
+#	output monitor only records the packed output of every clock cycle into a
+#	preallocated array. All cycles are compared at once at the end of the
+#	test.
+#
+#	The golden mode is enabled by the environment variable TB_GOLDEN=1.
+#
+#	The comparison is vectorized with NumPy if NumPy is installed and the
+#	packed outputs fit into a flat array (see utils.preallocate), otherwise it
+#	falls back to a Python loop.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import os
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+from utils import preallocate
+
+def goldenEnabled(environ=os.environ):
+	"""Returns True if the golden mode is selected by the environment variable TB_GOLDEN."""
+	return environ.get("TB_GOLDEN", "0") == "1"
+
+
+class GoldenOutputs(object):
+	"""
+	Expected outputs of a test, and the outputs recorded from the DUT.
+
+	Each output is packed by a packed_layout.PackedLayout, the expected
+	outputs additionally have a mask of the compared bits.
+	"""
+
+	def __init__(self, layout, expected):
+		"""
+		layout is the PackedLayout of the outputs. expected is a sequence of
+		tuples of field values, one per clock cycle. A field value of None means
+		don't care.
+		"""
+		self.layout =   layout
+		bits =          sum(layout.widths)
+		n =             len(expected)
+		self.bits =     bits
+		self.expected = preallocate(bits, n)
+		self.mask =     preallocate(bits, n)
+		self.received = preallocate(bits, n)
+		self.unknown =  preallocate(bits, n)
+		self.count =    0     # number of recorded outputs
+		self.overflow = 0     # number of outputs recorded beyond the expected ones
+
+		pack = layout.pack
+		for cycle, values in enumerate(expected):
+			self.expected[cycle], self.mask[cycle] = pack(values)
+
+	def __len__(self):
+		return len(self.expected)
+
+	def record(self, packed, unknown=0):
+		"""Records the packed output of the next clock cycle, see PackedLayout.resolve."""
+		count = self.count
+		if count < len(self.received):
+			self.received[count] = packed
+			self.unknown[count] =  unknown
+			self.count = count + 1
+		else:
+			self.overflow += 1
+
+	def mismatches(self):
+		"""Returns the list of all recorded clock cycles whose output differs from the expected one."""
+		n = self.count
+		if (np is not None) and not isinstance(self.expected, list) and (n > 0):
+			arrays = [np.frombuffer(column, dtype=column.typecode)[:n] for column in (self.expected, self.mask, self.received, self.unknown)]
+			expected, mask, received, unknown = arrays
+			return np.flatnonzero(((expected ^ received) | unknown) & mask).tolist()
+
+		return [cycle for cycle, (expected, mask, received, unknown)
+						in enumerate(zip(self.expected, self.mask, self.received[:n], self.unknown[:n]))
+						if ((expected ^ received) | unknown) & mask]
+
+	def describe(self, cycle):
+		"""Returns a description of the expected and received output of clock cycle cycle."""
+		layout = self.layout
+		expected, mask =      self.expected[cycle], self.mask[cycle]
+		received, unknown =   self.received[cycle], self.unknown[cycle]
+		return ("Cycle {0}: field(s) {1} differ.\nExpected: {2!s}.\nReceived: {3!s}.".format(
+			cycle, ", ".join(layout.diff(expected, mask, 0, received, layout.full_mask, unknown)),
+			layout.format(expected, mask), layout.format(received, layout.full_mask, unknown)))
+
+	def compare(self, log):
+		"""
+		Compares all recorded outputs and logs the first mismatch with full
+		field detail. Returns the number of errors, a missing output counts as
+		one error.
+		"""
+		mismatches = self.mismatches()
+		errors = len(mismatches)
+		if errors > 0:
+			log.error("{0} of {1} clock cycles differed from the golden output.".format(errors, len(self)))
+			log.warning(self.describe(mismatches[0]))
+
+		if self.count < len(self):
+			errors += 1
+			log.error("Only {0} of {1} outputs have been recorded.".format(self.count, len(self)))
+		return errors
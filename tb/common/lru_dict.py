@@ -35,12 +35,42 @@
 
 from collections import OrderedDict
 
+if hasattr(OrderedDict, "move_to_end"):
+	def _move_to_end(od, key, last):
+		od.move_to_end(key, last)
+
+else:
+	def _move_to_end(od, key, last):
+		"""
+		Python 2.7 has no OrderedDict.move_to_end. Relink the node of the
+		pure-Python implementation directly, which is also O(1).
+		"""
+		root = od._OrderedDict__root
+		link = od._OrderedDict__map[key]
+		link_prev, link_next, _ = link
+		link_prev[1] = link_next
+		link_next[0] = link_prev
+		if last:
+			last_link = root[0]
+			link[0] = last_link
+			link[1] = root
+			last_link[1] = root[0] = link
+		else:
+			first_link = root[1]
+			link[0] = root
+			link[1] = first_link
+			root[1] = first_link[0] = link
+
+
 class LeastRecentlyUsedDict(OrderedDict):
 	"""
 	The entries in this dictionary are ordered by the last addition or update
 	of key:value pairs. The maximum size of the dictionary can be specified
 	during object creation.
 
+	The first entry is the least-recently used (LRU) one, the last entry is the
+	most-recently used (MRU) one. All move and peek operations are O(1).
+
 	Based on this StackOverflow answer: http://stackoverflow.com/a/2437645/5466118
 	and the example on: https://docs.python.org/2/library/collections.html#ordereddict-examples-and-recipes
 	"""
@@ -56,9 +86,11 @@ class LeastRecentlyUsedDict(OrderedDict):
 
 	def __setitem__(self, key, value):
 		if key in self:
-			del self[key]
-		OrderedDict.__setitem__(self, key, value)
-		self._check_size_limit()
+			OrderedDict.__setitem__(self, key, value)
+			_move_to_end(self, key, True)
+		else:
+			OrderedDict.__setitem__(self, key, value)
+			self._check_size_limit()
 
 	def _check_size_limit(self):
 		if self._size_limit is not None:
@@ -77,19 +109,64 @@ class LeastRecentlyUsedDict(OrderedDict):
 		If no value is specified, then the current value of the key is used.
 		"""
 		if key in self:
-			old = self.copy()
-			if value is None:
-				value = self[key]
-
-			# build new list
-			self.clear()
-			self[key] = value
-			for k, v in old.iteritems():
-				if k == key: continue
-				self[k] = v
-
-#d = LeastRecentlyUsedDict(size_limit=5)
-#for key in range(4,-1,-1): d[key]=1
-#print "old=%s" % d
-#d.markLRU(2)
-#print "new=%s" % d
+			if value is not None:
+				OrderedDict.__setitem__(self, key, value)
+			_move_to_end(self, key, False)
+
+	def moveMRU(self, key, value=None):
+		"""
+		Mark key as most-recently used.
+		Does nothing, if key is not within dictionary.
+		If no value is specified, then the current value of the key is used.
+		"""
+		if key in self:
+			if value is not None:
+				OrderedDict.__setitem__(self, key, value)
+			_move_to_end(self, key, True)
+
+	def peekLRU(self):
+		"""
+		Return the least-recently used (key, value) pair without changing the order.
+		Raises KeyError if the dictionary is empty.
+		"""
+		for key in OrderedDict.__iter__(self):
+			return key, OrderedDict.__getitem__(self, key)
+		raise KeyError("peekLRU(): dictionary is empty")
+
+	def peekMRU(self):
+		"""
+		Return the most-recently used (key, value) pair without changing the order.
+		Raises KeyError if the dictionary is empty.
+		"""
+		for key in OrderedDict.__reversed__(self):
+			return key, OrderedDict.__getitem__(self, key)
+		raise KeyError("peekMRU(): dictionary is empty")
+
+
+if __name__ == "__main__":
+	# Micro-benchmark: the cost per operation must stay flat with growing size_limit.
+	import random
+	from timeit import default_timer
+
+	ops = 100000
+	print("{0:>8} {1:>12} {2:>12} {3:>12} {4:>12}".format("size", "moveLRU", "moveMRU", "peekLRU", "setitem"))
+	for size in (16, 256, 4096, 65536):
+		d = LeastRecentlyUsedDict(size_limit=size)
+		for key in range(size): d[key] = key
+		keys = [random.randrange(size) for _ in range(ops)]
+
+		results = []
+		for op in (d.moveLRU, d.moveMRU):
+			start = default_timer()
+			for key in keys: op(key)
+			results.append(default_timer() - start)
+
+		start = default_timer()
+		for _ in keys: d.peekLRU()
+		results.append(default_timer() - start)
+
+		start = default_timer()
+		for key in keys: d[key] = key
+		results.append(default_timer() - start)
+
+		print("{0:>8} {1:>9.0f} ns {2:>9.0f} ns {3:>9.0f} ns {4:>9.0f} ns".format(size, *[t * 1e9 / ops for t in results]))
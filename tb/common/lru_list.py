@@ -0,0 +1,171 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Array-based LRU list used by the Cocotb testbenches for LRU components
+#
+# Description:
+# ------------------------------------
+#	Provides a list of key:value pairs with LRU policy and a fixed capacity,
+#	e.g., the content of PoC.sort.lru_list.
+#
+#	The entries are held in a doubly linked list whose nodes are the slots of
+#	preallocated arrays. Slot 0 is the sentinel: its successor is the
+#	least-recently used entry, its predecessor the most-recently used one.
+#	Unused slots are kept on a free stack, and a dictionary maps each key to
+#	its slot. Thus, insert, remove, update and peek are O(1) for any
+#	capacity, and only the dictionary grows with the number of entries.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from utils import log2ceil, preallocate
+
+class LeastRecentlyUsedList(object):
+	"""
+	Key:value pairs ordered by the last addition or update, with at most
+	size_limit entries. Adding a new key to a full list removes the
+	least-recently used (LRU) entry.
+
+	Iteration, keys, values and items run from the LRU to the most-recently
+	used (MRU) entry, like LeastRecentlyUsedDict.
+	"""
+	__slots__ = ("size_limit", "_slots", "_next", "_prev", "_keys", "_values", "_free", "_freeCount")
+
+	def __init__(self, size_limit):
+		bits =            log2ceil(size_limit + 1)
+		self.size_limit = size_limit
+		self._slots =     {}                                  # key -> slot
+		self._next =      preallocate(bits, size_limit + 1)   # towards MRU
+		self._prev =      preallocate(bits, size_limit + 1)   # towards LRU
+		self._keys =      [None] * (size_limit + 1)
+		self._values =    [None] * (size_limit + 1)
+		self._free =      preallocate(bits, size_limit)
+		for i in range(size_limit):
+			self._free[i] = size_limit - i                      # slot 1 is allocated first
+		self._freeCount = size_limit
+
+	def __len__(self):
+		return len(self._slots)
+
+	def __contains__(self, key):
+		return key in self._slots
+
+	def __getitem__(self, key):
+		return self._values[self._slots[key]]
+
+	def __setitem__(self, key, value):
+		"""Adds or updates key and marks it as most-recently used."""
+		slot = self._slots.get(key)
+		if slot is not None:
+			self._unlink(slot)
+		else:
+			if self._freeCount == 0:
+				del self[self._keys[self._next[0]]]                # remove LRU entry
+			self._freeCount -= 1
+			slot = self._free[self._freeCount]
+			self._slots[key] = slot
+			self._keys[slot] = key
+
+		self._values[slot] = value
+		# link as MRU entry
+		nextSlot, prevSlot = self._next, self._prev
+		last = prevSlot[0]
+		nextSlot[last] = slot
+		prevSlot[slot] = last
+		nextSlot[slot] = 0
+		prevSlot[0] =    slot
+
+	def __delitem__(self, key):
+		slot = self._slots.pop(key)
+		self._unlink(slot)
+		self._keys[slot] =   None
+		self._values[slot] = None
+		self._free[self._freeCount] = slot
+		self._freeCount += 1
+
+	def _unlink(self, slot):
+		nextSlot, prevSlot = self._next, self._prev
+		successor, predecessor = nextSlot[slot], prevSlot[slot]
+		nextSlot[predecessor] = successor
+		prevSlot[successor] =   predecessor
+
+	def peekLRU(self):
+		"""Returns the (key, value) pair of the least-recently used entry, raises KeyError if empty."""
+		slot = self._next[0]
+		if slot == 0:
+			raise KeyError("peekLRU(): list is empty")
+		return self._keys[slot], self._values[slot]
+
+	def peekMRU(self):
+		"""Returns the (key, value) pair of the most-recently used entry, raises KeyError if empty."""
+		slot = self._prev[0]
+		if slot == 0:
+			raise KeyError("peekMRU(): list is empty")
+		return self._keys[slot], self._values[slot]
+
+	def _slotsInOrder(self):
+		nextSlot = self._next
+		slot = nextSlot[0]
+		while slot != 0:
+			yield slot
+			slot = nextSlot[slot]
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def keys(self):
+		return [self._keys[slot] for slot in self._slotsInOrder()]
+
+	def values(self):
+		return [self._values[slot] for slot in self._slotsInOrder()]
+
+	def items(self):
+		return [(self._keys[slot], self._values[slot]) for slot in self._slotsInOrder()]
+
+
+if __name__ == "__main__":
+	# Micro-benchmark: the cost per operation must stay flat with growing size_limit.
+	import random
+	from timeit import default_timer
+
+	ops = 100000
+	print("{0:>8} {1:>12} {2:>12} {3:>12}".format("size", "setitem", "delitem", "peekLRU"))
+	for size in (16, 256, 1024, 65536):
+		lru = LeastRecentlyUsedList(size)
+		keys = [random.randrange(2 * size) for _ in range(ops)]
+
+		results = []
+		start = default_timer()
+		for key in keys: lru[key] = key
+		results.append(default_timer() - start)
+
+		start = default_timer()
+		for key in keys:
+			if key in lru: del lru[key]
+		results.append(default_timer() - start)
+
+		for key in keys: lru[key] = key
+		start = default_timer()
+		for _ in keys: lru.peekLRU()
+		results.append(default_timer() - start)
+
+		print("{0:>8} {1:>9.0f} ns {2:>9.0f} ns {3:>9.0f} ns".format(size, *[t * 1e9 / ops for t in results]))
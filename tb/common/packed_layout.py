@@ -0,0 +1,102 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Packed transaction layout used by the Cocotb testbenches
+#
+# Description:
+# ------------------------------------
+#	Packs the fields of a transaction into one integer plus a mask of the bits
+#	to compare, so that comparing an expected and a received transaction is a
+#	single masked XOR.
+#
+#	Fields with value None are don't care and excluded from the mask. Fields
+#	read from the bus which cannot be resolved to an integer (e.g. 'X' or 'U')
+#	are flagged in a separate mask of unknown bits. The field-by-field view is
+#	only reconstructed for messages.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+class PackedLayout(object):
+	"""
+	Layout of a packed transaction. The first field is the most significant one.
+	"""
+	__slots__ = ("names", "widths", "shifts", "masks", "fields", "full_mask")
+
+	def __init__(self, fields):
+		"""fields is a sequence of (name, bits) tuples."""
+		self.names =  tuple(name for name, _ in fields)
+		self.widths = tuple(bits for _, bits in fields)
+
+		shifts, shift = [], 0
+		for bits in reversed(self.widths):
+			shifts.insert(0, shift)
+			shift += bits
+		self.shifts =    tuple(shifts)
+		self.masks =     tuple(((1 << bits) - 1) << shift for bits, shift in zip(self.widths, self.shifts))
+		self.fields =    tuple(zip(self.shifts, self.masks))
+		self.full_mask = (1 << shift) - 1
+
+	def pack(self, values):
+		"""
+		Packs the integer field values. Returns the tuple (packed, mask), where
+		mask excludes all fields with value None.
+		"""
+		packed, mask = 0, 0
+		for value, (shift, fieldMask) in zip(values, self.fields):
+			if value is not None:
+				packed |= value << shift
+				mask |=   fieldMask
+		return packed, mask
+
+	def resolve(self, values):
+		"""
+		Packs the field values read from the bus (e.g. BinaryValue objects).
+		Returns the tuple (packed, unknown), where unknown covers all fields
+		which cannot be resolved to an integer.
+		"""
+		packed, unknown = 0, 0
+		for value, (shift, fieldMask) in zip(values, self.fields):
+			try:
+				packed |= value.integer << shift
+			except ValueError:
+				unknown |= fieldMask
+		return packed, unknown
+
+	def unpack(self, packed):
+		"""Returns the tuple of integer field values."""
+		return tuple((packed & fieldMask) >> shift for shift, fieldMask in self.fields)
+
+	def format(self, packed, mask, unknown=0):
+		"""Returns a human-readable string of all fields. Don't care fields are printed as '-', unknown ones as 'X'."""
+		result = []
+		for name, (shift, fieldMask) in zip(self.names, self.fields):
+			if not (mask & fieldMask):   value = "-"
+			elif unknown & fieldMask:    value = "X"
+			else:                        value = "0x{0:x}".format((packed & fieldMask) >> shift)
+			result.append("{0}={1}".format(name, value))
+		return ", ".join(result)
+
+	def diff(self, packed1, mask1, unknown1, packed2, mask2, unknown2):
+		"""Returns the names of all fields selected by both masks which differ or are unknown."""
+		differing = ((packed1 ^ packed2) | unknown1 | unknown2) & mask1 & mask2
+		return [name for name, fieldMask in zip(self.names, self.masks) if differing & fieldMask]
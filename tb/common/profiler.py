@@ -0,0 +1,169 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Opt-in profiler of the Python hot paths of the Cocotb testbenches
+#
+# Description:
+# ------------------------------------
+#	Measures the time spent in the Python callbacks of a testbench, e.g., the
+#	monitors, the model and the scoreboard, so that it can be told apart from
+#	the time spent in the simulator.
+#
+#	Each instrumented component counts its calls, its time and the net number
+#	of memory blocks it allocated. Time and allocations are exclusive, i.e.,
+#	instrumented components called from another one are only accounted for
+#	themselves. Allocations are only available on Python 3.4 or newer.
+#
+#	The profiler is enabled by the environment variable TB_PROFILE, which
+#	selects the directory of the output file <name>_profile.json. If it is
+#	unset or empty, then the components are not instrumented at all.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import json
+import os
+import sys
+from timeit import default_timer
+
+# net number of allocated memory blocks, not available before Python 3.4
+_allocatedBlocks = getattr(sys, "getallocatedblocks", lambda: 0)
+ALLOCATIONS = hasattr(sys, "getallocatedblocks")
+
+class Profiler(object):
+	"""
+	Call counters and timers of the components of a testbench. If enabled is
+	False, then wrap, instrument and iterate return their argument unchanged.
+	"""
+
+	def __init__(self, enabled=True):
+		self.enabled =     enabled
+		self.components =  {}     # name -> [calls, seconds, blocks]
+		self._stack =      []     # [seconds, blocks] of the callees of each active component
+		self._start =      default_timer()
+
+	def _entry(self, name):
+		return self.components.setdefault(name, [0, 0.0, 0])
+
+	def wrap(self, name, function):
+		"""Returns function wrapped by the counters of component name."""
+		if not self.enabled:
+			return function
+
+		entry, stack = self._entry(name), self._stack
+		def profiled(*args, **kwargs):
+			callees = [0.0, 0]
+			stack.append(callees)
+			blocks = _allocatedBlocks()
+			start =  default_timer()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				elapsed = default_timer() - start
+				blocks =  _allocatedBlocks() - blocks
+				stack.pop()
+				entry[0] += 1
+				entry[1] += elapsed - callees[0]
+				entry[2] += blocks - callees[1]
+				if stack:
+					caller = stack[-1]
+					caller[0] += elapsed
+					caller[1] += blocks
+		return profiled
+
+	def instrument(self, obj, attribute, name=None):
+		"""Replaces the method attribute of the instance obj by its wrapped version, name defaults to attribute."""
+		if self.enabled:
+			setattr(obj, attribute, self.wrap(name or attribute, getattr(obj, attribute)))
+
+	def iterate(self, name, iterable):
+		"""Returns an iterator over iterable which accounts each step to component name."""
+		if not self.enabled:
+			return iterable
+		iterator = iter(iterable)
+		return self._iterate(self.wrap(name, getattr(iterator, "__next__", None) or iterator.next))
+
+	@staticmethod
+	def _iterate(step):
+		while True:
+			try:
+				item = step()
+			except StopIteration:
+				return
+			yield item
+
+	def calls(self, name):
+		"""Returns the number of calls of component name."""
+		return self.components[name][0] if name in self.components else 0
+
+	def asDict(self, cycles=None):
+		"""
+		Returns the results as dictionary. cycles is the number of simulated
+		clock cycles, if given, all results are also reported per cycle.
+		"""
+		wall =      default_timer() - self._start
+		profiled =  sum(entry[1] for entry in self.components.values())
+		result =    {"cycles": cycles, "wall_ns": int(wall * 1e9), "profiled_ns": int(profiled * 1e9),
+								 "unprofiled_ns": int((wall - profiled) * 1e9), "components": {}}
+		for name, (calls, seconds, blocks) in self.components.items():
+			component = {"calls": calls, "total_ns": int(seconds * 1e9),
+									 "ns_per_call": (seconds * 1e9 / calls) if calls else None,
+									 "allocations": blocks if ALLOCATIONS else None}
+			if cycles:
+				component["ns_per_cycle"] = seconds * 1e9 / cycles
+				component["allocations_per_cycle"] = (float(blocks) / cycles) if ALLOCATIONS else None
+			result["components"][name] = component
+		if cycles:
+			result["unprofiled_ns_per_cycle"] = (wall - profiled) * 1e9 / cycles
+		return result
+
+	def format(self, cycles=None):
+		"""Returns the results as table, one line per component."""
+		lines = ["{0:<24} {1:>10} {2:>14} {3:>14} {4:>14}".format("component", "calls", "ns/call", "ns/cycle", "allocs/cycle")]
+		for name, component in sorted(self.asDict(cycles)["components"].items()):
+			lines.append("{0:<24} {1:>10} {2:>14.0f} {3:>14} {4:>14}".format(name, component["calls"], component["ns_per_call"] or 0,
+				"{0:.0f}".format(component["ns_per_cycle"]) if "ns_per_cycle" in component else "-",
+				"{0:.2f}".format(component["allocations_per_cycle"]) if component.get("allocations_per_cycle") is not None else "-"))
+		return "\n".join(lines)
+
+	def dump(self, name, cycles=None, extra=None, environ=os.environ):
+		"""
+		Writes the results as JSON file and returns its path, or None if the
+		profiler is disabled. name identifies the testbench and test, extra is
+		a dictionary of additional entries.
+		"""
+		directory = environ.get("TB_PROFILE")
+		if not (self.enabled and directory):
+			return None
+
+		path =   os.path.join(directory, name + "_profile.json")
+		result = self.asDict(cycles)
+		if extra is not None:
+			result.update(extra)
+		with open(path, "w") as profileFile:
+			json.dump(result, profileFile, indent=2, sort_keys=True)
+		return path
+
+
+def createProfiler(environ=os.environ):
+	"""Returns a Profiler which is enabled if the environment variable TB_PROFILE is set."""
+	return Profiler(bool(environ.get("TB_PROFILE")))
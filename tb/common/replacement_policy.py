@@ -0,0 +1,226 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Cache replacement policy models used by the Cocotb cache testbenches
+#
+# Description:
+# ------------------------------------
+#	Provides reference models of cache replacement policies. Only "LRU" is
+#	implemented by PoC.cache.replacementpolicy and thus selectable by the
+#	generic REPLACEMENT_POLICY of the caches. "RR" and "PLRU" are model-only:
+#	they are used by the stimulus generators and the cache model to explore
+#	other policies, but have no hardware counterpart yet.
+#
+#	All models replace invalid cache lines first, starting with the lowest
+#	way. Each model keeps the replacement state of all cache sets in flat
+#	preallocated arrays. The models share one interface:
+#
+#	* access(index, way):     cache line was accessed (TagAccess without Invalidate)
+#	* invalidate(index, way): cache line was invalidated (TagAccess with Invalidate)
+#	* insert(index, way):     cache line was replaced (Replace)
+#	* victim(index):          way which will be replaced next (ReplaceWay)
+#	* age(index, way):        sort key to restore the replacement order by replaying inserts
+#
+#	Use createPolicy() to instantiate a model by the abbreviation used in VHDL.
+#	The testbenches accept only the policies in HARDWARE_POLICIES. RR and
+#	PLRU are used by the standalone cache model and its benchmark only.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from utils import log2ceil, preallocate
+
+
+class ReplacementPolicy(object):
+	"""
+	Shared defaults of all replacement policy models. A model implements the
+	methods access, invalidate, insert and victim listed in the module
+	description, and overrides age if it can restore its replacement order.
+	"""
+	__slots__ = ("sets", "ways")
+
+	def __init__(self, sets, ways):
+		self.sets = sets
+		self.ways = ways
+
+	def age(self, index, way):
+		"""
+		Returns a sort key for cache line (index, way). Inserting the valid
+		cache lines of a set in ascending order into an empty set restores the
+		replacement order as far as the policy allows.
+		"""
+		return 0
+
+
+class LeastRecentlyUsedPolicy(ReplacementPolicy):
+	"""
+	Models policy "LRU" as implemented by PoC.sort.lru_cache.
+
+	The age of a cache line is the value of a global access counter at the last
+	access. Invalidated cache lines get age 0 and thus are moved to the
+	least-recently used position, like the "Free" command of the hardware.
+	"""
+	__slots__ = ("ages", "_stamp")
+
+	def __init__(self, sets, ways):
+		ReplacementPolicy.__init__(self, sets, ways)
+		self.ages =   preallocate(64, sets * ways)
+		self._stamp = 0
+
+	def access(self, index, way):
+		self._stamp += 1
+		self.ages[index * self.ways + way] = self._stamp
+
+	def invalidate(self, index, way):
+		self.ages[index * self.ways + way] = 0
+
+	insert = access
+
+	def victim(self, index):
+		base = index * self.ways
+		ages = self.ages
+		victim = base
+		for slot in range(base + 1, base + self.ways):
+			if ages[slot] < ages[victim]:
+				victim = slot
+		return victim - base
+
+	def age(self, index, way):
+		return self.ages[index * self.ways + way]
+
+
+def _invalidWay(valid, base, ways):
+	"""Returns the first way of the cache set at base whose valid flag is 0, or -1."""
+	way = valid.find(b"\x00", base, base + ways)
+	return way if way < 0 else way - base
+
+
+class RoundRobinPolicy(ReplacementPolicy):
+	"""
+	Models policy "RR" (round robin, i.e., FIFO order of insertion), model-only.
+
+	Each cache set has a pointer to the way which is replaced next if all
+	ways are valid. The pointer is incremented when a valid cache line is
+	replaced, filling an invalid way, accesses and invalidations do not
+	change it.
+	"""
+	__slots__ = ("pointers", "valid")
+
+	def __init__(self, sets, ways):
+		ReplacementPolicy.__init__(self, sets, ways)
+		self.pointers = preallocate(self.ways.bit_length(), sets)
+		self.valid =    bytearray(sets * ways)
+
+	def access(self, index, way):
+		pass
+
+	def invalidate(self, index, way):
+		self.valid[index * self.ways + way] = 0
+
+	def insert(self, index, way):
+		slot = index * self.ways + way
+		if self.valid[slot]:
+			self.pointers[index] = (way + 1) % self.ways
+		else:
+			self.valid[slot] = 1
+
+	def victim(self, index):
+		way = _invalidWay(self.valid, index * self.ways, self.ways)
+		return self.pointers[index] if way < 0 else way
+
+	def age(self, index, way):
+		return (way - self.pointers[index]) % self.ways
+
+
+class PseudoLeastRecentlyUsedPolicy(ReplacementPolicy):
+	"""
+	Models policy "PLRU" (tree-based pseudo-LRU), model-only.
+
+	Each cache set has a binary tree of ways-1 bits stored in heap order. A bit
+	points to the subtree holding the next victim (0 = left, 1 = right).
+	Accesses let all bits on the path point away from the accessed way,
+	invalidations let them point towards the invalidated way. The tree only
+	selects the victim if all ways are valid. The number of ways must be a
+	power of two.
+	"""
+	__slots__ = ("levels", "nodes", "bits", "valid")
+
+	def __init__(self, sets, ways):
+		ReplacementPolicy.__init__(self, sets, ways)
+		self.levels = log2ceil(ways)
+		if (1 << self.levels) != ways:
+			raise ValueError("PLRU requires a power of two ways, got {0}.".format(ways))
+		self.nodes = ways - 1
+		self.bits =  bytearray(sets * self.nodes)
+		self.valid = bytearray(sets * ways)
+
+	def _update(self, index, way, towards):
+		bits, base = self.bits, index * self.nodes
+		node = 0
+		for level in range(self.levels - 1, -1, -1):
+			direction = (way >> level) & 1
+			bits[base + node] = direction if towards else direction ^ 1
+			node = 2 * node + 1 + direction
+
+	def access(self, index, way):
+		self._update(index, way, False)
+
+	def invalidate(self, index, way):
+		self.valid[index * self.ways + way] = 0
+		self._update(index, way, True)
+
+	def insert(self, index, way):
+		self.valid[index * self.ways + way] = 1
+		self._update(index, way, False)
+
+	def victim(self, index):
+		way = _invalidWay(self.valid, index * self.ways, self.ways)
+		if way >= 0:
+			return way
+		bits, base = self.bits, index * self.nodes
+		node, way = 0, 0
+		for _ in range(self.levels):
+			direction = bits[base + node]
+			way = (way << 1) | direction
+			node = 2 * node + 1 + direction
+		return way
+
+
+POLICIES = {
+	"LRU":  LeastRecentlyUsedPolicy,
+	"RR":   RoundRobinPolicy,
+	"PLRU": PseudoLeastRecentlyUsedPolicy
+}
+
+# policies implemented by PoC.cache.replacementpolicy, the others are model-only
+HARDWARE_POLICIES = ("LRU",)
+
+def createPolicy(name, sets, ways):
+	"""
+	Creates the model of replacement policy name for a cache with sets cache
+	sets of ways ways each. Raises ValueError for unknown policies.
+	"""
+	try:
+		policy = POLICIES[name]
+	except KeyError:
+		raise ValueError("Unsupported replacement policy: {0}".format(name))
+	return policy(sets, ways)
@@ -0,0 +1,102 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Soak mode with checkpoint / resume for the Cocotb testbenches
+#
+# Description:
+# ------------------------------------
+#	Runs a testbench in chunks of random transactions until a cycle or
+#	wall-clock budget is exhausted. After each chunk, the testbench saves a
+#	checkpoint with the state of the random number generator and of the
+#	reference model. A killed or timed-out run resumes from the last
+#	checkpoint.
+#
+#	The soak mode is configured by environment variables:
+#
+#	* SOAK_CYCLES:              number of random transactions to apply (0 = unlimited)
+#	* SOAK_SECONDS:             wall-clock budget in seconds (0 = unlimited)
+#	* SOAK_CHECKPOINT:          checkpoint file, default: <testbench>.soak
+#	* SOAK_CHECKPOINT_INTERVAL: number of transactions per chunk, default: 10000
+#
+#	The soak mode is enabled if SOAK_CYCLES or SOAK_SECONDS is set. The
+#	checkpoint is deleted when the cycle budget has been completed.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import os
+import pickle
+from timeit import default_timer
+
+class SoakControl(object):
+	"""Budget and checkpoints of a soak run."""
+
+	def __init__(self, name, environ=os.environ):
+		"""name is the name of the testbench, it is used for the default checkpoint file."""
+		self.cycles =   int(environ.get("SOAK_CYCLES", 0))
+		self.seconds =  float(environ.get("SOAK_SECONDS", 0))
+		self.interval = int(environ.get("SOAK_CHECKPOINT_INTERVAL", 10000))
+		self.path =     environ.get("SOAK_CHECKPOINT", name + ".soak")
+		self.enabled =  (self.cycles > 0) or (self.seconds > 0)
+		self.cycle =    0
+		self._start =   default_timer()
+
+	def load(self):
+		"""
+		Returns the state saved by the last checkpoint, or None if there is no
+		checkpoint. The cycle counter continues from the checkpoint.
+		"""
+		if not os.path.exists(self.path):
+			return None
+
+		with open(self.path, "rb") as checkpointFile:
+			state = pickle.load(checkpointFile)
+		self.cycle = state.pop("cycle")
+		return state
+
+	def chunk(self):
+		"""Returns the number of transactions of the next chunk, or 0 if the budget is exhausted."""
+		if (self.seconds > 0) and (default_timer() - self._start >= self.seconds):
+			return 0
+		if self.cycles > 0:
+			return max(0, min(self.interval, self.cycles - self.cycle))
+		return self.interval
+
+	def save(self, n, state):
+		"""
+		Marks n more transactions as completed and saves state (a dictionary) as
+		new checkpoint. The file is replaced atomically, so that a killed run
+		leaves the previous checkpoint intact.
+		"""
+		self.cycle += n
+		state = dict(state, cycle=self.cycle)
+		temp = self.path + ".tmp"
+		with open(temp, "wb") as checkpointFile:
+			pickle.dump(state, checkpointFile, pickle.HIGHEST_PROTOCOL)
+		if os.name == "nt" and os.path.exists(self.path):
+			os.remove(self.path)
+		os.rename(temp, self.path)
+
+	def finish(self):
+		"""Deletes the checkpoint if the cycle budget has been completed."""
+		if (self.cycles > 0) and (self.cycle >= self.cycles) and os.path.exists(self.path):
+			os.remove(self.path)
@@ -0,0 +1,160 @@
+# EMACS settings: -*-	tab-width: 2; indent-tabs-mode: t; python-indent-offset: 2 -*-
+# vim: tabstop=2:shiftwidth=2:noexpandtab
+# kate: tab-width 2; replace-tabs off; indent-width 2;
+#
+# ==============================================================================
+# Authors:				 		Martin Zabel
+#
+# Python Module:		  Binary transaction traces for the Cocotb cache testbenches
+#
+# Description:
+# ------------------------------------
+#	Records and replays the input transactions (request, readWrite,
+#	invalidate, replace, address, data) of a cache testbench.
+#
+#	File format, all numbers little-endian:
+#	* header, 16 bytes: magic "PoCTRACE", version (uint8), reserved (uint8),
+#	  address bits (uint16), data bits (uint16), reserved (uint16)
+#	* records of fixed size: command flags (uint8, bit 0 = request,
+#	  bit 1 = readWrite, bit 2 = invalidate, bit 3 = replace), followed by
+#	  the address and the data in the minimal number of bytes
+#
+#	TraceReader maps the file into memory and decodes it in chunks, so that
+#	traces larger than the main memory can be replayed. TraceWriter buffers
+#	the encoded records and writes them in chunks.
+#
+#	Requires NumPy.
+#
+# License:
+# ==============================================================================
+# Copyright 2007-2016 Technische Universitaet Dresden - Germany
+#											Chair of VLSI-Design, Diagnostics and Architecture
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#		http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import os
+import struct
+
+import numpy as np
+
+TRACE_MAGIC =   b"PoCTRACE"
+TRACE_VERSION = 1
+TRACE_HEADER =  struct.Struct("<8sBBHHH")
+
+# number of records encoded / decoded at once
+CHUNK_SIZE = 65536
+
+def _bytesOf(bits):
+	return (bits + 7) // 8
+
+def _encode(value, size):
+	"""Returns the integer value as size bytes, little-endian."""
+	return bytearray((value >> shift) & 0xFF for shift in range(0, 8 * size, 8))
+
+def _decode(columns):
+	"""Returns the little-endian integers stored in the rows of the uint8 matrix columns."""
+	n, size = columns.shape
+	if size <= 8:
+		padded = np.zeros((n, 8), dtype=np.uint8)
+		padded[:, :size] = columns
+		return padded.view("<u8").ravel()
+
+	result = np.zeros(n, dtype=object)
+	for byte in range(size - 1, -1, -1):
+		result = (result << 8) | columns[:, byte].astype(object)
+	return result
+
+
+class TraceWriter(object):
+	"""Writes a transaction trace. Can be used as callback of a BusMonitor."""
+
+	def __init__(self, path, address_bits, data_bits):
+		self.address_bytes = _bytesOf(address_bits)
+		self.data_bytes =    _bytesOf(data_bits)
+		self.records =       0
+		self._buffer =       bytearray()
+		self._file =         open(path, "wb")
+		self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, 0, address_bits, data_bits, 0))
+
+	def write(self, request, readWrite, invalidate, replace, address, data):
+		"""Appends one record to the trace. Records written after close are ignored."""
+		if self._file.closed:
+			return
+		buffer = self._buffer
+		buffer.append(request | (readWrite << 1) | (invalidate << 2) | (replace << 3))
+		buffer += _encode(address, self.address_bytes)
+		buffer += _encode(data, self.data_bytes)
+		self.records += 1
+		if self.records % CHUNK_SIZE == 0:
+			self.flush()
+
+	def __call__(self, transaction):
+		"""Appends the transaction tuple (request, readWrite, invalidate, replace, address, data) to the trace."""
+		self.write(*transaction)
+
+	def flush(self):
+		self._file.write(self._buffer)
+		self._file.flush()
+		del self._buffer[:]
+
+	def close(self):
+		if not self._file.closed:
+			self.flush()
+			self._file.close()
+
+
+class TraceReader(object):
+	"""Memory-mapped transaction trace."""
+
+	def __init__(self, path):
+		with open(path, "rb") as traceFile:
+			header = traceFile.read(TRACE_HEADER.size)
+		if len(header) < TRACE_HEADER.size:
+			raise ValueError("File '{0}' is too short for a trace.".format(path))
+
+		magic, version, _, self.address_bits, self.data_bits, _ = TRACE_HEADER.unpack(header)
+		if (magic != TRACE_MAGIC) or (version != TRACE_VERSION):
+			raise ValueError("File '{0}' is not a trace of version {1}.".format(path, TRACE_VERSION))
+
+		self.address_bytes = _bytesOf(self.address_bits)
+		self.data_bytes =    _bytesOf(self.data_bits)
+		self.record_size =   1 + self.address_bytes + self.data_bytes
+		self.records =       (os.path.getsize(path) - TRACE_HEADER.size) // self.record_size
+		self.path =          path
+
+	def __len__(self):
+		return self.records
+
+	def chunks(self, size=CHUNK_SIZE):
+		"""
+		Returns the trace in chunks of up to size records. Each chunk is a tuple
+		of the arrays (request, readWrite, invalidate, replace, address, data).
+		"""
+		if self.records == 0:
+			return
+
+		trace = np.memmap(self.path, dtype=np.uint8, mode="r", offset=TRACE_HEADER.size,
+											shape=(self.records, self.record_size))
+		addressEnd = 1 + self.address_bytes
+		for start in range(0, self.records, size):
+			block = trace[start:start + size]
+			flags = block[:, 0]
+			yield (flags & 1, (flags >> 1) & 1, (flags >> 2) & 1, (flags >> 3) & 1,
+						 _decode(block[:, 1:addressEnd]), _decode(block[:, addressEnd:]))
+
+	def rows(self, size=CHUNK_SIZE):
+		"""Returns the records as tuples (request, readWrite, invalidate, replace, address, data) of Python integers."""
+		for chunk in self.chunks(size):
+			for row in zip(*[column.tolist() for column in chunk]):
+				yield row
@@ -34,19 +34,117 @@
 # limitations under the License.
 # ==============================================================================
 
-def log2ceil(arg):
-	"""Calculates: ceil(ld(arg)) for integers."""
-	if arg == 1: return 0
+import os
+from array import array
+
+def preallocate(bits, length):
+	"""
+	Returns a zero-initialized flat array with length elements which can hold
+	unsigned values of the given bit width. Falls back to a list if no array
+	type is wide enough.
+	"""
+	for typecode in ("B", "H", "I", "L"):
+		if array(typecode).itemsize * 8 >= bits:
+			return array(typecode, [0]) * length
+	return [0] * length
+
+class RingPool(object):
+	"""
+	Round-robin pool of preallocated objects, e.g., transactions which are
+	updated in place instead of being allocated anew on every clock cycle.
 
-	tmp, log = 1, 0
-	while arg > tmp:
-		tmp = tmp * 2
-		log = log + 1
+	An object is handed out again only after size-1 other objects. A size of
+	2 ensures that the transaction driven in the previous clock cycle is not
+	modified before its value has been written to the simulator.
+	"""
+	__slots__ = ("_items", "_next")
 
-	return log
+	def __init__(self, factory, size=2):
+		"""factory is called size times without arguments to create the pool."""
+		self._items = [factory() for _ in range(size)]
+		self._next =  0
+
+	def get(self):
+		"""Returns the next object of the pool."""
+		item = self._items[self._next]
+		self._next = (self._next + 1) % len(self._items)
+		return item
+
+def optionValues(name, default, convert=str, environ=os.environ):
+	"""
+	Returns the list of values of test option name for a Cocotb TestFactory.
+	The values are read from the comma-separated environment variable
+	TB_OPTION_<NAME>, the value 'None' is passed as None. Returns [default] if
+	the variable is not set.
+	"""
+	text = environ.get("TB_OPTION_" + name.upper(), "")
+	if text.strip() == "":
+		return [default]
+	return [None if value.strip() == "None" else convert(value.strip()) for value in text.split(",")]
+
+def log2ceil(arg):
+	"""Calculates: ceil(ld(arg)) for integers."""
+	if arg <= 1: return 0
+	return (arg - 1).bit_length()
 
 def log2ceilnz(arg):
 	"""Calculates: max(1, ceil(ld(arg))) for integers."""
 	res = log2ceil(arg)
 	if res == 0: return 1
 	return res
+
+def log2floor(arg):
+	"""Calculates: floor(ld(arg)) for positive integers."""
+	if arg < 1:
+		raise ValueError("log2floor: argument must be positive, was {0}.".format(arg))
+	return arg.bit_length() - 1
+
+def bitMask(bits):
+	"""Returns an integer with the lower bits set."""
+	return (1 << bits) - 1
+
+def indexOf(address, index_bits):
+	"""
+	Returns the cache set index of address, i.e., the lower index_bits.
+	address may also be a NumPy array of addresses.
+	"""
+	return address & bitMask(index_bits)
+
+def tagOf(address, index_bits, tag_bits):
+	"""
+	Returns the tag of address, i.e., the tag_bits above the index.
+	address may also be a NumPy array of addresses.
+	"""
+	return (address >> index_bits) & bitMask(tag_bits)
+
+def log2floorArray(values):
+	"""
+	Calculates floor(ld(value)) for each element of a NumPy array or
+	sequence of positive integers. Values wider than 64 bits are supported
+	as object arrays. Requires NumPy.
+	"""
+	import numpy as np
+	values = np.asarray(values)
+	if values.dtype == object:
+		return np.array([log2floor(value) for value in values.ravel().tolist()], dtype=np.int64).reshape(values.shape)
+	if np.any(values < 1):
+		raise ValueError("log2floorArray: all values must be positive.")
+
+	# binary search on the bit position, one vector operation per step
+	values = values.astype(np.uint64)
+	result = np.zeros(values.shape, dtype=np.int64)
+	for shift in (32, 16, 8, 4, 2, 1):
+		upper = values >= np.uint64(1 << shift)
+		result[upper] += shift
+		values = np.where(upper, values >> np.uint64(shift), values)
+	return result
+
+def log2ceilArray(values):
+	"""Calculates ceil(ld(value)) for each element of a NumPy array or sequence of integers. Requires NumPy."""
+	import numpy as np
+	values = np.asarray(values)
+	result = np.zeros(values.shape, dtype=np.int64)
+	above = values > 1
+	if np.any(above):
+		result[above] = log2floorArray(values[above] - 1) + 1
+	return result
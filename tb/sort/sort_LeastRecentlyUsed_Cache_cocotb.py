@@ -41,7 +41,17 @@ from cocotb.binary import BinaryValue
 from cocotb.regression import TestFactory
 from cocotb.scoreboard import Scoreboard
 
-from lru_dict import LeastRecentlyUsedDict
+from bus_sampler import BusSampler
+from cache_model import LeastRecentlyUsedCacheModel
+from expected_queue import ExpectedOutputQueue
+from golden_compare import GoldenOutputs, goldenEnabled
+from packed_layout import PackedLayout
+from profiler import createProfiler
+from soak import SoakControl
+from utils import log2ceilnz, RingPool
+
+# maximum number of expected transactions the model may run ahead of the DUT
+HIGH_WATER_MARK=16
 
 # ==============================================================================
 class InputDriver(BusDriver):
@@ -53,11 +63,17 @@ class InputDriver(BusDriver):
 
 class InputTransaction(object):
 	"""Creates transaction to be send by InputDriver"""
-	def __init__(self, insert, invalidate, keyin):
+	def __init__(self, insert=0, invalidate=0, keyin=0):
 		self.Insert = BinaryValue(insert, 1)
 		self.Free = BinaryValue(invalidate, 1)
 		self.KeyIn = BinaryValue(keyin, 5, False)
 
+	def assign(self, insert, invalidate, keyin):
+		"""Updates the integer payload in place, so that the BinaryValue objects can be reused."""
+		self.Insert.integer = insert
+		self.Free.integer = invalidate
+		self.KeyIn.integer = keyin
+
 # ==============================================================================
 class InputMonitor(BusMonitor):
 	"""Observes inputs of DUT."""
@@ -66,6 +82,7 @@ class InputMonitor(BusMonitor):
 	def __init__(self, dut, callback=None, event=None):
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "in"
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -74,17 +91,23 @@ class InputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
-			vec = tuple([getattr(self.bus,i).value.integer for i in self._signals])
-			self._recv(vec)
+			self._sample()
+
+	def _sample(self):
+		# copy, the sampler reuses its buffer for the next sample
+		self._recv(tuple(self._sampler.integers()))
 
 # ==============================================================================
 class OutputMonitor(BusMonitor):
 	"""Observes outputs of DUT."""
 	_signals = [ "KeyOut" ]
 
-	def __init__(self, dut, callback=None, event=None):
+	def __init__(self, dut, tb, callback=None, event=None):
+		"""tb must be an instance of the Testbench class."""
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "out"
+		self.tb = tb
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -93,8 +116,14 @@ class OutputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
-			vec = self.bus.KeyOut.value.integer
-			self._recv(vec)
+			self._sample()
+
+	def _sample(self):
+		if self.tb.golden is not None:
+			self.tb.golden.record(*self.tb.output_layout.resolve(self._sampler.values()))
+			return
+
+		self._recv(self._sampler.integers()[0])
 
 # ==============================================================================
 class Testbench(object):
@@ -102,38 +131,51 @@ class Testbench(object):
 		self.dut = dut
 		self.stopped = False
 		elements = dut.ELEMENTS.value;
-		self.lru = LeastRecentlyUsedDict(size_limit=elements)
-
-		# initial state of LRU list
-		for keyin in range(elements-1, -1, -1):
-			self.lru[keyin] = 1
+		self.lru_model = LeastRecentlyUsedCacheModel(elements)
+		self.lru = self.lru_model.lru
 
 		init_val = elements-1
+		self.init_val = init_val
+		self.output_layout = PackedLayout((("KeyOut", log2ceilnz(elements)),))
+
+		# opt-in profiler of the Python callbacks, see run_test
+		self.profiler = createProfiler()
 
 		self.input_drv = InputDriver(dut)
-		self.output_mon = OutputMonitor(dut)
+		self.output_mon = OutputMonitor(dut, self)
 
 		# Create a scoreboard on the outputs
-		self.expected_output = [ init_val ]
+		self.expected_output = ExpectedOutputQueue([ init_val ], HIGH_WATER_MARK)
 		self.scoreboard = Scoreboard(dut)
 		self.scoreboard.add_interface(self.output_mon, self.expected_output)
 
 		# Reconstruct the input transactions from the pins
 		# and send them to our 'model'
-		self.input_mon = InputMonitor(dut, callback=self.model)
+		self.input_mon = InputMonitor(dut, callback=self.profiler.wrap("model", self.model))
+
+		self.profiler.instrument(self.input_mon, "_sample", "in._monitor_recv")
+		self.profiler.instrument(self.output_mon, "_sample", "out._monitor_recv")
+		self.profiler.instrument(self.scoreboard, "compare", "scoreboard.compare")
+
+		# precomputed outputs in golden mode, see precompute
+		self.golden = None
+
+	def precompute(self, commands):
+		"""
+		Switch to golden mode: the expected outputs for the input tuples commands
+		are computed up front. Afterwards, the model and the scoreboard are
+		bypassed and the OutputMonitor only records the outputs.
+		"""
+		self.expected_output.pop(0) # initial output is part of the golden outputs
+		self.golden = GoldenOutputs(self.output_layout, [(self.init_val,)] + [(keyout,) for keyout in self.lru_model.step_many(commands)])
 
 	def model(self, transaction):
 		'''Model the DUT based on the input transaction.'''
 		insert, free, keyin = transaction
 		#print "=== model called with stopped=%r, Insert=%d, Free=%d, KeyIn=%d" % (self.stopped, insert, free, keyin)
-		if not self.stopped:
-			if insert == 1:
-				self.lru[keyin] = 1
-			elif free == 1:
-				self.lru.moveLRU(keyin)
-
+		if not self.stopped and (self.golden is None):
+			keyout = self.lru_model.step(insert, free, keyin)
 			#print "=== model: lru=%s" % self.lru.items()
-			keyout = self.lru.iterkeys().next()
 			#print "=== model: KeyOut=%d" % keyout
 			self.expected_output.append(keyout)
 
@@ -147,11 +189,13 @@ class Testbench(object):
 
 
 # ==============================================================================
-def random_input_gen(n=2000):
+def random_input_gen(tb, n=2000, golden=False):
 	"""
 	Generate random input data to be applied by InputDriver.
 	Returns up to n instances of InputTransaction.
+	If golden is True, the expected outputs are precomputed by tb.precompute.
 	"""
+	commands = []
 	for _ in range(n):
 		command = random.randint(1,100)
 		insert, free = 0, 0
@@ -159,7 +203,45 @@ def random_input_gen(n=2000):
 		if command > 11: insert = 1
 		elif command > 10: free = 1
 		#print "=== random_input_gen: command=%d, insert=%d, free=%d" % (command, insert, free)
-		yield InputTransaction(insert, free, random.randint(0, 31))
+		commands.append((insert, free, random.randint(0, 31)))
+	if golden: tb.precompute(commands)
+
+	pool = RingPool(InputTransaction)
+	for command in commands:
+		transaction = pool.get()
+		transaction.assign(*command)
+		yield transaction
+
+@cocotb.coroutine
+def soak_test(tb, soak):
+	"""
+	Issue random transactions in chunks until the budget of the soak run is
+	exhausted. The state of the model is checkpointed after each chunk.
+	Upon resume, the checkpointed LRU order is restored first.
+	"""
+	sync = False
+	state = soak.load()
+	if state is not None:
+		random.setstate(state["random"])
+		tb.scoreboard.errors += state["errors"]
+		# Insert the checkpointed keys from least- to most-recently used to restore the order of DUT and model.
+		for keyin in state["keys"]:
+			yield tb.input_drv.send(InputTransaction(1, 0, keyin), sync)
+			sync = True
+
+	n = soak.chunk()
+	while n > 0:
+		for transaction in tb.profiler.iterate("input_gen", random_input_gen(tb, n)):
+			yield tb.input_drv.send(transaction, sync)
+			sync = True
+
+		# Apply idle command until the model has seen the last transaction of this chunk.
+		yield tb.input_drv.send(InputTransaction(0, 0, 0))
+		yield RisingEdge(tb.dut.Clock)
+		soak.save(n, {"random": random.getstate(), "errors": tb.scoreboard.errors, "keys": list(tb.lru.keys())})
+		n = soak.chunk()
+
+	soak.finish()
 
 @cocotb.coroutine
 def clock_gen(signal):
@@ -175,14 +257,19 @@ def run_test(dut):
 	tb = Testbench(dut)
 	dut.Reset <= 0
 
-	input_gen = random_input_gen()
+	soak = SoakControl("sort_LeastRecentlyUsed_Cache")
+	if soak.enabled:
+		yield soak_test(tb, soak)
+
+	else:
+		input_gen = tb.profiler.iterate("input_gen", random_input_gen(tb, golden=goldenEnabled()))
 
-	# Issue first transaction immediately.
-	yield tb.input_drv.send(input_gen.next(), False)
+		# Issue first transaction immediately.
+		yield tb.input_drv.send(input_gen.next(), False)
 
-	# Issue next transactions.
-	for t in input_gen:
-		yield tb.input_drv.send(t)
+		# Issue next transactions.
+		for t in input_gen:
+			yield tb.input_drv.send(t)
 
 	# Wait for rising-edge of clock to execute last transaction from above.
 	# Apply idle command in following clock cycle, but stop generation of expected output data.
@@ -191,6 +278,15 @@ def run_test(dut):
 	tb.stop()
 	yield RisingEdge(dut.Clock)
 
+	# Dump the time spent in the Python callbacks, one output sample per clock cycle.
+	cycles = tb.profiler.calls("out._monitor_recv")
+	path = tb.profiler.dump("sort_LeastRecentlyUsed_Cache", cycles)
+	if path is not None: dut._log.info("Profile written to {0}.\n{1}".format(path, tb.profiler.format(cycles)))
+
+	# Compare the recorded outputs in golden mode.
+	if tb.golden is not None:
+		tb.scoreboard.errors += tb.golden.compare(dut._log)
+
 	# Print result of scoreboard.
 	raise tb.scoreboard.result
 
@@ -11,6 +11,9 @@
 # ------------------------------------
 #	Automated testbench for PoC.sort_LeastRecentlyUsed
 #
+#	The number of elements, the key and the data width are taken from the
+#	generics ELEMENTS, KEY_BITS and DATA_BITS of the DUT.
+#
 # License:
 # ==============================================================================
 # Copyright 2007-2016 Technische Universitaet Dresden - Germany
@@ -42,7 +45,17 @@ from cocotb.regression import TestFactory
 from cocotb.scoreboard import Scoreboard
 from cocotb.result import TestFailure
 
-from lru_dict import LeastRecentlyUsedDict
+from bus_sampler import BusSampler
+from cache_model import LeastRecentlyUsedListModel
+from expected_queue import ExpectedOutputQueue
+from golden_compare import GoldenOutputs, goldenEnabled
+from packed_layout import PackedLayout
+from profiler import createProfiler
+from soak import SoakControl
+from utils import RingPool
+
+# maximum number of expected transactions the model may run ahead of the DUT
+HIGH_WATER_MARK=16
 
 # ==============================================================================
 class InputDriver(BusDriver):
@@ -54,10 +67,17 @@ class InputDriver(BusDriver):
 
 class InputTransaction(object):
 	"""Creates transaction to be send by InputDriver"""
-	def __init__(self, insert, remove, datain):
+	def __init__(self, tb, insert=0, remove=0, datain=0):
+		"tb must be an instance of the Testbench class"
 		self.Insert = BinaryValue(insert, 1)
 		self.Remove = BinaryValue(remove, 1)
-		self.DataIn  = BinaryValue(datain, 8, False)
+		self.DataIn  = BinaryValue(datain, tb.data_bits, False)
+
+	def assign(self, insert, remove, datain):
+		"""Updates the integer payload in place, so that the BinaryValue objects can be reused."""
+		self.Insert.integer = insert
+		self.Remove.integer = remove
+		self.DataIn.integer = datain
 
 # ==============================================================================
 class InputMonitor(BusMonitor):
@@ -67,6 +87,7 @@ class InputMonitor(BusMonitor):
 	def __init__(self, dut, callback=None, event=None):
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "in"
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -75,17 +96,23 @@ class InputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
-			vec = tuple([getattr(self.bus,i).value.integer for i in self._signals])
-			self._recv(vec)
+			self._sample()
+
+	def _sample(self):
+		# copy, the sampler reuses its buffer for the next sample
+		self._recv(tuple(self._sampler.integers()))
 
 # ==============================================================================
 class OutputMonitor(BusMonitor):
 	"""Observes outputs of DUT."""
 	_signals = [ "Valid", "DataOut" ]
 
-	def __init__(self, dut, callback=None, event=None):
+	def __init__(self, dut, tb, callback=None, event=None):
+		"""tb must be an instance of the Testbench class."""
 		BusMonitor.__init__(self, dut, None, dut.Clock, dut.Reset, callback=callback, event=event)
 		self.name = "out"
+		self.tb = tb
+		self._sampler = BusSampler(self.bus, self._signals)
 
 	@coroutine
 	def _monitor_recv(self):
@@ -94,8 +121,15 @@ class OutputMonitor(BusMonitor):
 		while True:
 			# Capture signals at rising-edge of clock.
 			yield clkedge
-			vec = tuple([getattr(self.bus,i).value.integer for i in self._signals])
-			self._recv(vec)
+			self._sample()
+
+	def _sample(self):
+		if self.tb.golden is not None:
+			self.tb.golden.record(*self.tb.output_layout.resolve(self._sampler.values()))
+			return
+
+		# copy, the sampler reuses its buffer for the next sample
+		self._recv(tuple(self._sampler.integers()))
 
 # ==============================================================================
 class Testbench(object):
@@ -127,44 +161,54 @@ class Testbench(object):
 		self.dut = dut
 		self.stopped = False
 		elements = dut.ELEMENTS.value;
-		self.lru = LeastRecentlyUsedDict(size_limit=elements)
+		self.key_bits = dut.KEY_BITS.value
+		self.data_bits = dut.DATA_BITS.value
+		self.lru_model = LeastRecentlyUsedListModel(elements, self.key_bits)
+		self.lru = self.lru_model.lru
 
-		if elements != 16:
-			raise TestFailure("Unsupported number of elements.")
+		# opt-in profiler of the Python callbacks, see run_test
+		self.profiler = createProfiler()
 
 		self.input_drv = InputDriver(dut)
-		self.output_mon = OutputMonitor(dut)
+		self.output_mon = OutputMonitor(dut, self)
 
 		# Create a scoreboard on the outputs
-		self.expected_output = [ init_val ]
+		self.expected_output = ExpectedOutputQueue([ init_val ], HIGH_WATER_MARK)
 		self.scoreboard = Testbench.MyScoreboard(dut)
 		self.scoreboard.add_interface(self.output_mon, self.expected_output)
 
 		# Reconstruct the input transactions from the pins
 		# and send them to our 'model'
-		self.input_mon = InputMonitor(dut, callback=self.model)
+		self.input_mon = InputMonitor(dut, callback=self.profiler.wrap("model", self.model))
+
+		self.profiler.instrument(self.input_mon, "_sample", "in._monitor_recv")
+		self.profiler.instrument(self.output_mon, "_sample", "out._monitor_recv")
+		self.profiler.instrument(self.scoreboard, "compare", "scoreboard.compare")
+
+		# precomputed outputs in golden mode, see precompute
+		self.init_val = init_val
+		self.output_layout = PackedLayout((("Valid", 1), ("DataOut", self.data_bits)))
+		self.golden = None
+
+	def precompute(self, commands):
+		"""
+		Switch to golden mode: the expected outputs for the input tuples commands
+		are computed up front. Afterwards, the model and the scoreboard are
+		bypassed and the OutputMonitor only records the outputs. DataOut is
+		only compared if Valid is set.
+		"""
+		self.expected_output.pop(0) # initial output is part of the golden outputs
+		expected = [self.init_val] + self.lru_model.step_many(commands)
+		self.golden = GoldenOutputs(self.output_layout, [(valid, dataout if valid == 1 else None) for valid, dataout in expected])
 
 	def model(self, transaction):
 		'''Model the DUT based on the input transaction.'''
 		insert, remove, datain = transaction
-		keyin = datain & 0x0f
-		#print "=== model called with stopped=%r, Insert=%d, Remove=%d, KeyIn=%d, DataIn=%d" % (self.stopped, insert, remove, keyin, datain)
-		if not self.stopped:
-			if insert == 1:
-				self.lru[keyin] = datain
-			#elif free == 1:
-			#	self.lru.moveLRU(keyin, datain)
-			elif remove == 1:
-				if keyin in self.lru: del self.lru[keyin]
-
+		#print "=== model called with stopped=%r, Insert=%d, Remove=%d, DataIn=%d" % (self.stopped, insert, remove, datain)
+		if not self.stopped and (self.golden is None):
+			valid, dataout = self.lru_model.step(insert, remove, datain)
 			#print "=== model: lru=%s" % self.lru.items()
-			if len(self.lru) < 1:
-				#print "=== model: to few elements, yet."
-				self.expected_output.append( (0, 0) )
-			else:
-				dataout = self.lru.itervalues().next()
-				#print "=== model: LRU element=%d" % dataout
-				self.expected_output.append( (1, dataout) )
+			self.expected_output.append( (valid, dataout) )
 
 	def stop(self):
 		"""
@@ -176,19 +220,61 @@ class Testbench(object):
 
 
 # ==============================================================================
-def random_input_gen(n=5000):
+def random_input_gen(tb, n=5000, golden=False):
 	"""
 	Generate random input data to be applied by InputDriver.
 	Returns up to n instances of InputTransaction.
+	tb must an instance of the Testbench class.
+	If golden is True, the expected outputs are precomputed by tb.precompute.
 	"""
+	data_max = 2**tb.data_bits - 1
+	commands = []
 	for _ in range(n):
-		command, datain = random.randint(1,100), random.randint(0, 255)
+		command, datain = random.randint(1,100), random.randint(0, data_max)
 		insert, remove = 0, 0
 		# 80% insert, 10% remove, 10% idle
 		if command > 20: insert = 1
 		elif command > 10: remove = 1
 		#print "=== random_input_gen: insert=%d, datain=%d" % (insert, free, datain)
-		yield InputTransaction(insert, remove, datain)
+		commands.append((insert, remove, datain))
+	if golden: tb.precompute(commands)
+
+	pool = RingPool(lambda: InputTransaction(tb))
+	for command in commands:
+		transaction = pool.get()
+		transaction.assign(*command)
+		yield transaction
+
+@cocotb.coroutine
+def soak_test(tb, soak):
+	"""
+	Issue random transactions in chunks until the budget of the soak run is
+	exhausted. The state of the model is checkpointed after each chunk.
+	Upon resume, the checkpointed LRU order is restored first.
+	"""
+	sync = False
+	state = soak.load()
+	if state is not None:
+		random.setstate(state["random"])
+		tb.scoreboard.errors += state["errors"]
+		# Insert the checkpointed elements from least- to most-recently used to restore the order of DUT and model.
+		for datain in state["elements"]:
+			yield tb.input_drv.send(InputTransaction(tb, 1, 0, datain), sync)
+			sync = True
+
+	n = soak.chunk()
+	while n > 0:
+		for transaction in tb.profiler.iterate("input_gen", random_input_gen(tb, n)):
+			yield tb.input_drv.send(transaction, sync)
+			sync = True
+
+		# Apply idle command until the model has seen the last transaction of this chunk.
+		yield tb.input_drv.send(InputTransaction(tb))
+		yield RisingEdge(tb.dut.Clock)
+		soak.save(n, {"random": random.getstate(), "errors": tb.scoreboard.errors, "elements": list(tb.lru.values())})
+		n = soak.chunk()
+
+	soak.finish()
 
 @cocotb.coroutine
 def clock_gen(signal):
@@ -204,22 +290,36 @@ def run_test(dut):
 	tb = Testbench(dut, (0, 0))
 	dut.Reset <= 0
 
-	input_gen = random_input_gen()
+	soak = SoakControl("sort_LeastRecentlyUsed_List")
+	if soak.enabled:
+		yield soak_test(tb, soak)
+
+	else:
+		input_gen = tb.profiler.iterate("input_gen", random_input_gen(tb, golden=goldenEnabled()))
 
-	# Issue first transaction immediately.
-	yield tb.input_drv.send(input_gen.next(), False)
+		# Issue first transaction immediately.
+		yield tb.input_drv.send(input_gen.next(), False)
 
-	# Issue next transactions.
-	for t in input_gen:
-		yield tb.input_drv.send(t)
+		# Issue next transactions.
+		for t in input_gen:
+			yield tb.input_drv.send(t)
 
 	# Wait for rising-edge of clock to execute last transaction from above.
 	# Apply idle command in following clock cycle, but stop generation of expected output data.
 	# Finish clock cycle to capture the resulting output from the last transaction above.
-	yield tb.input_drv.send(InputTransaction(0, 0, 0))
+	yield tb.input_drv.send(InputTransaction(tb))
 	tb.stop()
 	yield RisingEdge(dut.Clock)
 
+	# Dump the time spent in the Python callbacks, one output sample per clock cycle.
+	cycles = tb.profiler.calls("out._monitor_recv")
+	path = tb.profiler.dump("sort_LeastRecentlyUsed_List", cycles)
+	if path is not None: dut._log.info("Profile written to {0}.\n{1}".format(path, tb.profiler.format(cycles)))
+
+	# Compare the recorded outputs in golden mode.
+	if tb.golden is not None:
+		tb.scoreboard.errors += tb.golden.compare(dut._log)
+
 	# Print result of scoreboard.
 	raise tb.scoreboard.result
 